@@ -1,18 +1,63 @@
 import os
+import time
+from sqlalchemy import ARRAY, any_, event, literal
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
+from app.utils.histogram import Histogram
+
 # Load environment variables
 load_dotenv()
 
 # Get database URL from .env
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Pool sizing, per worker process
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds, -1 to never recycle
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0").lower() in ("1", "true", "yes")
+# Prepared statements kept per asyncpg connection (0 disables, e.g. behind pgbouncer)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# Pool counters, fed by pool events, and the time checkouts waited for a connection
+pool_counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+pool_wait_seconds = Histogram([0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10])
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited, connecting included
+
+    Sessions check out lazily on their first statement, so this is the wait a
+    request actually hit, not time a session sat holding an idle connection.
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started)
+
+
+engine_options = {"pool_recycle": DB_POOL_RECYCLE, "pool_pre_ping": DB_POOL_PRE_PING}
+if DATABASE_URL and not DATABASE_URL.startswith("sqlite"):  # SQLite gets a NullPool, nothing to size or wait on
+    engine_options.update(poolclass=TimedQueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                          pool_timeout=DB_POOL_TIMEOUT)
+if DATABASE_URL and DATABASE_URL.startswith("postgresql+asyncpg"):
+    engine_options["connect_args"] = {
+        "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+
 # Create async engine
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,  # Set to True for debugging
+    **engine_options,
 )
 
 # Create async session factory
@@ -22,7 +67,49 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_counters["connects"] += 1
+
+@event.listens_for(engine.sync_engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_counters["checkouts"] += 1
+
+@event.listens_for(engine.sync_engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_counters["checkins"] += 1
+
+@event.listens_for(engine.sync_engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_counters["invalidations"] += 1
+
+def pool_stats() -> dict:
+    """Current pool occupancy plus checkout counters and the wait-time histogram"""
+    pool = engine.sync_engine.pool
+    stats = {"pool_class": type(pool).__name__, **pool_counters, "wait_seconds": pool_wait_seconds.snapshot()}
+    if hasattr(pool, "checkedout"):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    return stats
+
+def any_of(db: AsyncSession, column, values):
+    """column IN values, as a single statement shape on Postgres
+
+    Expanding IN renders one placeholder per value, so every list length is a
+    different statement to asyncpg's prepared-statement cache; = ANY(array) is
+    the same statement however many values are bound.
+    """
+    values = list(values)
+    if db.bind.dialect.name == "postgresql":
+        return column == any_(literal(values, ARRAY(column.type)))
+    return column.in_(values)
+
 # Dependency to get DB session
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -1,8 +1,25 @@
-from fastapi import FastAPI
+import time
+import_started = time.perf_counter()  # Start of the app import, for the startup report
+
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import providers, ai_assistant  # Add ai_assistant
+from app.routers import providers, ai_assistant, drg, stats
+from app.utils.llm import close_llm_client
+from app.utils.timing import ServerTimingMiddleware
+from app.warmup import run_warmup, startup_report
+
+startup_report["import_seconds"] = round(time.perf_counter() - import_started, 4)
 
-app = FastAPI(title="Healthcare Cost Navigator")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm caches, indexes and pooled connections before the worker takes traffic
+    await run_warmup(import_started)
+    yield
+    await close_llm_client()
+
+app = FastAPI(title="Healthcare Cost Navigator", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -11,12 +28,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-stage timings on every response (METRICS_ENABLED=0 turns it off)
+app.add_middleware(ServerTimingMiddleware)
+
 @app.get("/")
 async def root():
     return {"message": "Healthcare Cost Navigator API", "endpoints": ["/providers", "/ask"]}
 
+@app.get("/ready")
+async def ready(response: Response):
+    """Readiness probe: 200 with the startup report once warm, 503 (retrying the warmup) until then"""
+    if not startup_report["ready"]:
+        await run_warmup(import_started)
+    if not startup_report["ready"]:
+        response.status_code = 503
+    return startup_report
+
 # Include routers
 app.include_router(providers.router)
-app.include_router(ai_assistant.router)  # Add this line
\ No newline at end of file
+app.include_router(ai_assistant.router)
+app.include_router(drg.router)
+app.include_router(stats.router)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -11,10 +11,18 @@ class Provider(Base):
     city = Column(String, nullable=False)
     state = Column(String, nullable=False)
     zip_code = Column(String, nullable=False, index=True)  # Index for radius search
+    lat = Column(Float)  # From uszips.csv, NULL if the ZIP can't be located
+    lng = Column(Float)
+    row_hash = Column(String)  # Change detection for incremental ETL
     
     # Relationships
     procedures = relationship("Procedure", back_populates="provider")
     ratings = relationship("Rating", back_populates="provider", uselist=False)
+    
+    # Index for bounding-box radius prefilter
+    __table_args__ = (
+        Index('idx_provider_location', 'lat', 'lng'),
+    )
 
 class Procedure(Base):
     __tablename__ = "procedures"
@@ -27,6 +35,7 @@ class Procedure(Base):
     avg_covered_charges = Column(Float)
     avg_total_payments = Column(Float)
     avg_medicare_payments = Column(Float)
+    row_hash = Column(String)  # Change detection for incremental ETL
     
     # Relationship
     provider = relationship("Provider", back_populates="procedures")
@@ -34,6 +43,7 @@ class Procedure(Base):
     # Index for DRG searches
     __table_args__ = (
         Index('idx_drg_search', 'drg_code', 'drg_description'),
+        UniqueConstraint('provider_id', 'drg_code', name='uq_procedure_provider_drg'),  # Upsert key
     )
 
 class Rating(Base):
@@ -42,6 +52,45 @@ class Rating(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     provider_id = Column(String, ForeignKey("providers.provider_id"), unique=True)
     rating = Column(Integer, nullable=False)  # 1-10
+    row_hash = Column(String)  # Change detection for incremental ETL
     
     # Relationship
-    provider = relationship("Provider", back_populates="ratings")
\ No newline at end of file
+    provider = relationship("Provider", back_populates="ratings")
+
+class DatasetMeta(Base):
+    __tablename__ = "dataset_meta"
+    
+    id = Column(Integer, primary_key=True)  # Single row, id = 1
+    generation = Column(Integer, nullable=False, default=0)  # Bumped by every ETL load
+
+class DrgPriceRollup(Base):
+    __tablename__ = "drg_price_rollups"
+    
+    # One row per (drg_code, state, zip3) grouping set, rebuilt by every ETL load.
+    # state and zip3 are NULL on the rolled-up rows: NULL state = national, NULL zip3 = whole state
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    drg_code = Column(String, nullable=False)
+    drg_description = Column(String, nullable=False)
+    state = Column(String)
+    zip3 = Column(String)  # First three digits of the provider ZIP
+    provider_count = Column(Integer, nullable=False)
+    total_discharges = Column(Integer)
+    
+    # Discharge-weighted mean, min/max and percentiles of each price column
+    covered_charges_mean = Column(Float)
+    covered_charges_min = Column(Float)
+    covered_charges_max = Column(Float)
+    covered_charges_p10 = Column(Float)
+    covered_charges_p50 = Column(Float)
+    covered_charges_p90 = Column(Float)
+    total_payments_mean = Column(Float)
+    total_payments_min = Column(Float)
+    total_payments_max = Column(Float)
+    total_payments_p10 = Column(Float)
+    total_payments_p50 = Column(Float)
+    total_payments_p90 = Column(Float)
+    
+    # Index for /drg/{code}/stats lookups
+    __table_args__ = (
+        Index('idx_rollup_lookup', 'drg_code', 'state', 'zip3'),
+    )
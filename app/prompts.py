@@ -6,6 +6,8 @@ Database schema:
 - providers: provider_id, name, city, state, zip_code
 - procedures: provider_id, drg_code, drg_description, avg_covered_charges, avg_total_payments, avg_medicare_payments, total_discharges
 - ratings: provider_id, rating (1-10)
+- drg_price_rollups: drg_code, drg_description, state, zip3, provider_count, total_discharges, covered_charges_mean, covered_charges_min, covered_charges_max, covered_charges_p10, covered_charges_p50, covered_charges_p90, total_payments_mean, total_payments_min, total_payments_max, total_payments_p10, total_payments_p50, total_payments_p90
+  (precomputed per DRG; state IS NULL = national row, zip3 IS NULL = whole-state row)
 
 QUERY RULES:
 
@@ -39,4 +41,11 @@ QUERY RULES:
    - Location filtering happens in application, not SQL
    - Return ALL results for location queries, limited results for general queries
 
+6. TYPICAL / AVERAGE / MEDIAN PRICES (no specific hospital asked for):
+   SELECT drg_price_rollups.* FROM drg_price_rollups
+   WHERE drg_price_rollups.drg_code = '470' AND drg_price_rollups.state = 'NY' AND drg_price_rollups.zip3 IS NULL
+   - National: drg_price_rollups.state IS NULL
+   - Near a ZIP: drg_price_rollups.zip3 = first three digits of the ZIP (e.g. '100' for 10001)
+   - Never aggregate the procedures table for these questions
+
 Return ONLY the SQL query."""
\ No newline at end of file
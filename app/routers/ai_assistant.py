@@ -1,21 +1,36 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
+import asyncio
+import contextvars
 import os
+import random
 import re
-from openai import OpenAI
-from dotenv import load_dotenv
 
-from app.database import get_db
+from app.database import AsyncSessionLocal, get_db
 from app.models import Provider, Procedure, Rating
-from app.schemas import AskRequest, AskResponse
+from app.schemas import AskBatchRequest, AskBatchResponse, AskRequest, AskResponse
 from app.prompts import SYSTEM_PROMPT
-from app.utils.location import calculate_distance
-
-load_dotenv()
+from app.utils.drg_index import get_drg_index
+from app.utils.generation import get_dataset_generation
+from app.utils.llm import get_llm_client
+from app.utils.location import get_neighbors
+from app.utils.singleflight import SingleFlight
+from app.utils.sql_guard import RejectedQuery, guarded_fetch
+from app.utils.sql_rewrite import UnsupportedQuery, reads_table, rewrite_select
+from app.utils.timing import record_rows, stage, timed
+from app.utils.translation_cache import get_translation_cache
 
 router = APIRouter()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Hard cap on rows fetched for an answer
+ASK_MAX_ROWS = int(os.getenv("ASK_MAX_ROWS", "50"))
+# Questions from one /ask/batch request answered at the same time
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "16"))
+# Answer common question shapes from SQL templates instead of the LLM
+ASK_INTENT_MATCHING = os.getenv("ASK_INTENT_MATCHING", "1").lower() in ("1", "true", "yes")
+# Share of template answers also sent to the LLM in the background to compare answers
+ASK_INTENT_SHADOW_RATE = float(os.getenv("ASK_INTENT_SHADOW_RATE", "0"))
 
 def clean_sql_query(sql: str) -> str:
     """Remove markdown code blocks and clean SQL"""
@@ -24,10 +39,130 @@ def clean_sql_query(sql: str) -> str:
     sql = sql.strip()
     return sql
 
-# Add debugging to app/routers/ai_assistant.py in execute_with_location_filter
+# Unqualified or procedures.-qualified only; other tables (drg_price_rollups) and aliases are left alone
+DESCRIPTION_FILTER = re.compile(
+    r"(?<![\w.])(procedures\.)?drg_description\s+I?LIKE\s+'%([^'%_]+)%'", re.IGNORECASE
+)
+
+def resolve_drg_descriptions(sql: str, drg_index) -> str:
+    """Replace drg_description ILIKE '%term%' filters with indexed drg_code IN (...) lookups"""
+    def to_codes(match):
+        codes = drg_index.search(match.group(2))
+        if not codes:
+            return "1 = 0"
+        quoted = ", ".join("'" + code.replace("'", "''") + "'" for code in codes)
+        return f"{match.group(1) or ''}drg_code IN ({quoted})"
+    
+    return DESCRIPTION_FILTER.sub(to_codes, sql)
+
+# Question shapes SYSTEM_PROMPT spells out: intent -> (phrase pattern, metric column, ORDER BY, joins ratings)
+INTENTS = {
+    "cheapest": (
+        r"\b(?:cheapest|least expensive|most affordable|lowest (?:cost|price|priced|charges?))\b",
+        "procedures.avg_covered_charges", "procedures.avg_covered_charges ASC", False,
+    ),
+    "best_rated": (
+        r"\b(?:best|highest|top)[ -]rated\b|\b(?:best|highest|top) ratings?\b",
+        "ratings.rating", "ratings.rating DESC", True,
+    ),
+    "most_discharges": (
+        r"\bmost (?:discharges|procedures|cases|patients)\b|\bhighest volume\b|\bbusiest\b",
+        "procedures.total_discharges", "procedures.total_discharges DESC", False,
+    ),
+}
+INTENT_PATTERNS = {intent: re.compile(spec[0]) for intent, spec in INTENTS.items()}
+LOCATION_PHRASE = re.compile(r"\bwithin \d+ (?:miles|mi) of \d{5}\b|\bnear \d{5}\b")
+TOP_PHRASE = re.compile(r"\btop (\d{1,3})\b")
+DRG_PHRASE = re.compile(r"\bdrg (?:code )?(\d{1,3})\b")
+# Words that carry no condition; anything else left over must be part of a DRG description
+FILLER_WORDS = {
+    "which", "what", "who", "where", "is", "are", "the", "a", "an", "me", "show", "list", "find", "give",
+    "get", "hospital", "hospitals", "provider", "providers", "facility", "facilities", "place", "places",
+    "have", "has", "does", "do", "perform", "performs", "for", "with", "of", "in", "on", "at", "to",
+    "procedure", "procedures", "surgery", "surgeries", "treatment", "treatments",
+}
+
+# Identical questions arriving while one is being answered wait for its answer
+ask_flight = SingleFlight("ask")
+
+def question_key(question: str) -> str:
+    """Coalescing key: every step reads the question case-insensitively"""
+    return " ".join(question.lower().split())
+
+# Template hits per intent, LLM fallbacks, and shadow comparison results
+intent_counters = {**{intent: 0 for intent in INTENTS}, "miss": 0}
+shadow_counters = {"matched": 0, "mismatched": 0, "errors": 0}
+_shadow_tasks = set()
+
+def match_intent(question: str, drg_index):
+    """Return (intent, SQL) for a question with a known shape, or (None, None)
+
+    The question must be one intent phrase plus a DRG code or description
+    words, an optional "top N" and the location phrases
+    execute_with_location_filter understands; any other word is a miss.
+    The SQL follows SYSTEM_PROMPT, so it runs through the same pipeline as a
+    model translation. Only [a-z0-9 ] reaches it, so nothing needs quoting.
+    """
+    text = " ".join(re.sub(r"[^a-z0-9 ]+", " ", question.lower()).split())
+    has_location = LOCATION_PHRASE.search(text) is not None
+    text = LOCATION_PHRASE.sub(" ", text)
+    
+    matched = []
+    for intent, pattern in INTENT_PATTERNS.items():
+        text, count = pattern.subn(" ", text)
+        if count:
+            matched.append(intent)
+    if len(matched) != 1:
+        return None, None
+    intent = matched[0]
+    
+    top = TOP_PHRASE.search(text)
+    if top and int(top.group(1)) < 1:
+        return None, None  # "top 0" isn't a question the template can answer
+    text = TOP_PHRASE.sub(" ", text)
+    code = DRG_PHRASE.search(text)
+    text = DRG_PHRASE.sub(" ", text)
+    
+    term = " ".join(word for word in text.split() if word not in FILLER_WORDS)
+    if code:
+        if term:
+            return None, None
+        condition = f"procedures.drg_code = '{code.group(1)}'"
+    elif term and not any(c.isdigit() for c in term) and drg_index.covers(term):
+        condition = f"procedures.drg_description ILIKE '%{term}%'"
+    else:
+        return None, None
+    
+    _, metric, order_by, with_ratings = INTENTS[intent]
+    sql = (
+        f"SELECT providers.name, providers.city, providers.state, providers.zip_code, {metric} "
+        f"FROM providers JOIN procedures ON providers.provider_id = procedures.provider_id "
+    )
+    if with_ratings:
+        sql += "JOIN ratings ON providers.provider_id = ratings.provider_id "
+    sql += f"WHERE {condition} ORDER BY {order_by}"
+    if top:
+        sql += f" LIMIT {int(top.group(1))}"
+    elif not has_location:
+        sql += " LIMIT 10"
+    return intent, sql
+
+def intent_stats() -> dict:
+    """Template hit rate and shadow comparison counters"""
+    hits = sum(intent_counters[intent] for intent in INTENTS)
+    total = hits + intent_counters["miss"]
+    return {
+        "enabled": ASK_INTENT_MATCHING,
+        "hits": hits,
+        "misses": intent_counters["miss"],
+        "hit_rate": hits / total if total else 0.0,
+        "by_intent": {intent: intent_counters[intent] for intent in INTENTS},
+        "shadow_rate": ASK_INTENT_SHADOW_RATE,
+        "shadow": dict(shadow_counters),
+    }
 
 async def execute_with_location_filter(db: AsyncSession, sql: str, question: str):
-    """Execute SQL and filter by distance if location is specified"""
+    """Execute SQL, restricted to providers within the radius if a location is specified"""
     # Check for explicit distance
     explicit_distance = re.search(r'within (\d+) (?:miles|mi) of (\d{5})', question.lower())
     # Check for implicit distance (near ZIP)
@@ -41,40 +176,62 @@ async def execute_with_location_filter(db: AsyncSession, sql: str, question: str
         miles = 50  # Default 50 miles for "near [ZIP]"
         zip_code = implicit_distance.group(1)
         radius_km = miles * 1.60934
-    else:
-        # No location filter needed
-        result = await db.execute(text(sql))
-        return result.fetchall()
     
-    print(f"📍 Filtering for locations within {miles} miles of {zip_code}")
+    # No location, or rows that aren't providers (drg_price_rollups is located by its own
+    # state/zip3 columns in the SQL). Never fetch more than the answer can use
+    if not (explicit_distance or implicit_distance) or not reads_table(sql, "providers"):
+        try:
+            with stage("sql_rewrite"):
+                sql = rewrite_select(sql, ASK_MAX_ROWS)
+        except UnsupportedQuery:
+            pass
+        return await fetch_rows(db, sql)
     
-    # Execute and filter by distance
-    result = await db.execute(text(sql))
-    all_rows = result.fetchall()
+    # Providers within the radius come from the per-ZIP neighbour cache
+    await get_dataset_generation(db)  # Drops cached providers after an ETL reload
+    neighbors = await timed("neighbors", get_neighbors(db, zip_code, radius_km))
+    if neighbors is None:
+        return []
     
-    print(f"📊 Got {len(all_rows)} rows from database")
+    # Let the database apply the radius and row cap
+    try:
+        with stage("sql_rewrite"):
+            located_sql = rewrite_select(sql, ASK_MAX_ROWS, provider_ids=neighbors.provider_ids.tolist())
+    except UnsupportedQuery as e:
+        print(f"⚠️  Could not rewrite SQL ({e}), filtering within {miles} miles of {zip_code} in Python")
+    else:
+        return await fetch_rows(db, located_sql)
     
-    filtered_rows = []
-    checked_count = 0
-    for row in all_rows:
-        # Find zip_code in row (it should be at index 3 based on SELECT order)
-        provider_zip = row[3] if len(row) > 3 else None
-        
-        if provider_zip:
-            distance = calculate_distance(zip_code, provider_zip)
-            distance_miles = distance * 0.621371
-            checked_count += 1
-            
-            if checked_count <= 5:  # Debug first 5
-                print(f"  - {row[0]} ({provider_zip}): {distance_miles:.1f} miles")
+    # Fallback: run the statement as generated and filter on the ZIP column
+    all_rows = await fetch_rows(db, sql)
+    
+    with stage("distance_filter"):
+        zip_distances = neighbors.zip_distance_map()
+        filtered_rows = []
+        for row in all_rows:
+            # Find zip_code in row (it should be at index 3 based on SELECT order)
+            provider_zip = row[3] if len(row) > 3 else None
             
-            if distance <= radius_km:
+            # Only ZIPs of providers within the radius are in the map
+            if provider_zip and zip_distances.get(str(provider_zip)) is not None:
                 filtered_rows.append(row)
-    
-    print(f"✅ Filtered to {len(filtered_rows)} results within {miles} miles")
+    record_rows("distance_filter", len(filtered_rows))
     
     return filtered_rows
 
+async def fetch_rows(db: AsyncSession, sql: str) -> list:
+    """Execute generated SQL through the cost guard, timed as the db stage"""
+    with stage("db"):
+        rows = await guarded_fetch(db, sql)
+    record_rows("db", len(rows))
+    return rows
+
+# Columns a drg_price_rollups row needs for the price-distribution answer
+ROLLUP_ANSWER_COLUMNS = {
+    "drg_code", "drg_description", "provider_count",
+    "covered_charges_p10", "covered_charges_p50", "covered_charges_p90", "total_payments_p50",
+}
+
 def format_answer(question: str, rows: list, sql_query: str) -> str:
     """Format SQL results into natural language based on the question"""
     if not rows:
@@ -82,6 +239,18 @@ def format_answer(question: str, rows: list, sql_query: str) -> str:
     
     question_lower = question.lower()
     
+    # Precomputed price distribution from the DRG rollup
+    columns = rows[0]._mapping if hasattr(rows[0], "_mapping") else {}
+    if ROLLUP_ANSWER_COLUMNS <= set(columns):
+        area = columns.get("zip3") and f"ZIP3 {columns['zip3']}" or columns.get("state") or "nationwide"
+        return (
+            f"Based on data, DRG {columns['drg_code']} ({columns['drg_description']}) {area}: "
+            f"median average covered charge ${columns['covered_charges_p50']:,.2f} "
+            f"(10th-90th percentile ${columns['covered_charges_p10']:,.2f}-${columns['covered_charges_p90']:,.2f}), "
+            f"median average total payment ${columns['total_payments_p50']:,.2f}, "
+            f"across {columns['provider_count']} hospitals"
+        )
+    
     # For "cheapest" queries, always return single result
     if "cheapest" in question_lower or "who is cheapest" in question_lower:
         row = rows[0]  # Already sorted by price ascending
@@ -117,45 +286,139 @@ async def ask_question(
     db: AsyncSession = Depends(get_db)
 ):
     """Natural language interface for healthcare queries"""
+    return await ask_flight.do(question_key(request.question), lambda: answer_question(db, request.question))
+
+@router.post("/ask/batch", response_model=AskBatchResponse)
+async def ask_questions(request: AskBatchRequest):
+    """Answer many questions concurrently, one AskResponse per question in request order
+
+    Identical questions are answered once, also sharing answers already in
+    flight for /ask. Each distinct question gets its own pooled session, with
+    at most ASK_BATCH_CONCURRENCY in flight.
+    """
+    semaphore = asyncio.Semaphore(ASK_BATCH_CONCURRENCY)
+    
+    async def answer_in_session(question: str) -> AskResponse:
+        async with AsyncSessionLocal() as db:
+            return await answer_question(db, question)
+    
+    async def answer(question: str) -> AskResponse:
+        async with semaphore:
+            try:
+                return await ask_flight.do(question_key(question), lambda: answer_in_session(question))
+            except Exception as e:  # e.g. no connection available from the pool
+                return AskResponse(answer=f"Error: {str(e)}", sql_query=None, error=str(e))
+    
+    questions = [item.question for item in request.questions]
+    unique = list(dict.fromkeys(questions))
+    answers = dict(zip(unique, await asyncio.gather(*(answer(q) for q in unique))))
+    
+    return AskBatchResponse(results=[answers[q] for q in questions])
+
+async def answer_question(db: AsyncSession, question: str) -> AskResponse:
+    """Translate a question to SQL, run it and phrase the answer"""
     
     try:
-        # Get SQL from OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        drg_index = await get_drg_index(db)
+        
+        # Common question shapes skip the LLM entirely
+        intent, sql_query = None, None
+        if ASK_INTENT_MATCHING:
+            with stage("intent"):
+                intent, sql_query = match_intent(question, drg_index)
+            intent_counters[intent or "miss"] += 1
+        
+        if sql_query is None:
+            sql_query = await translate_question(question)
+        
+        response = await run_translation(db, question, sql_query, drg_index)
+        
+        if intent and random.random() < ASK_INTENT_SHADOW_RATE:
+            # Fresh context, so the shadow run's stages stay out of this request's Server-Timing
+            task = asyncio.create_task(shadow_compare(question, response), context=contextvars.Context())
+            _shadow_tasks.add(task)
+            task.add_done_callback(_shadow_tasks.discard)
+        
+        return response
+        
+    except Exception as e:
+        return AskResponse(
+            answer=f"Error: {str(e)}",
+            sql_query=None,
+            error=str(e)
+        )
+
+async def translate_question(question: str) -> str:
+    """SQL for a question from the translation cache, or from the LLM on a miss"""
+    # Reuse a cached translation when we've seen this question shape before
+    translations = get_translation_cache()
+    with stage("translation_cache"):
+        sql_query = await translations.get(question)
+    
+    if sql_query is None:
+        # Get SQL from the LLM without blocking the event loop
+        response = await timed("llm", get_llm_client().complete(
             messages=[
                 {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": request.question}
+                {"role": "user", "content": question}
             ],
             max_tokens=200,
             temperature=0  # Set to 0 for most consistent results
-        )
-        
-        sql_query = response.choices[0].message.content.strip()
-        
-        # Check if it's an out-of-scope response
-        if "I can only help with" in sql_query:
-            return AskResponse(
-                answer="I can only help with hospital pricing and quality information. Please ask about medical procedures, costs, or hospital ratings.",
-                sql_query=None
-            )
+        ))
         
-        # Clean the SQL query
-        clean_sql = clean_sql_query(sql_query)
-        
-        # Execute with location filtering if needed
-        try:
-            rows = await execute_with_location_filter(db, clean_sql, request.question)
-            answer = format_answer(request.question, rows, clean_sql)
-        except Exception as db_error:
-            answer = f"Database error: {str(db_error)}"
-            
+        sql_query = response.strip()
+        await translations.put(question, sql_query)
+    
+    return sql_query
+
+async def run_translation(db: AsyncSession, question: str, sql_query: str, drg_index) -> AskResponse:
+    """Run translated SQL and phrase the answer"""
+    # Check if it's an out-of-scope response
+    if "I can only help with" in sql_query:
         return AskResponse(
-            answer=answer,
-            sql_query=clean_sql
+            answer="I can only help with hospital pricing and quality information. Please ask about medical procedures, costs, or hospital ratings.",
+            sql_query=None
         )
+    
+    # Clean the SQL query and turn description searches into code lookups
+    clean_sql = clean_sql_query(sql_query)
+    with stage("drg_index"):
+        clean_sql = resolve_drg_descriptions(clean_sql, drg_index)
+    
+    # Execute with location filtering if needed
+    error = None
+    try:
+        rows = await execute_with_location_filter(db, clean_sql, question)
+        with stage("format"):
+            answer = format_answer(question, rows, clean_sql)
+    except RejectedQuery as rejected:
+        answer = f"Query rejected: {rejected}. Try a more specific question."
+        error = str(rejected)
+    except Exception as db_error:
+        answer = f"Database error: {str(db_error)}"
+        error = str(db_error)
         
+    return AskResponse(
+        answer=answer,
+        sql_query=clean_sql,
+        error=error
+    )
+
+async def shadow_compare(question: str, template_response: AskResponse):
+    """Answer a template-matched question through the LLM as well and count whether the answers agree"""
+    try:
+        async with AsyncSessionLocal() as db:
+            drg_index = await get_drg_index(db)
+            llm_response = await run_translation(db, question, await translate_question(question), drg_index)
     except Exception as e:
-        return AskResponse(
-            answer=f"Error: {str(e)}",
-            sql_query=None
-        )
\ No newline at end of file
+        shadow_counters["errors"] += 1
+        print(f"⚠️  Shadow comparison failed for {question!r}: {e}")
+        return
+    
+    if llm_response.answer == template_response.answer:
+        shadow_counters["matched"] += 1
+    else:
+        shadow_counters["mismatched"] += 1
+        print(f"⚠️  Template and LLM answers differ for {question!r}\n"
+              f"    template: {template_response.sql_query}\n"
+              f"    llm:      {llm_response.sql_query}")
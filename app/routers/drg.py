@@ -0,0 +1,67 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, or_, and_
+
+from app.database import get_db
+from app.models import DrgPriceRollup
+from app.schemas import DrgStatsResponse
+from app.utils.timing import record_rows, timed
+
+router = APIRouter()
+
+PRICES = ("covered_charges", "total_payments")
+STATISTICS = ("mean", "min", "max", "p10", "p50", "p90")
+
+@router.get("/drg/{code}/stats", response_model=DrgStatsResponse)
+async def drg_stats(
+    code: str,
+    state: Optional[str] = Query(None, min_length=2, max_length=2, description="Two-letter state: its row and its ZIP3 rows"),
+    zip: Optional[str] = Query(None, pattern=r"^\d{3,5}$", description="ZIP or ZIP3: its row and its state's row"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Price distribution for one DRG from the ETL-built rollup, nationally and by state / ZIP3
+
+    Without filters: the national row and one row per state.
+    """
+    rollup = DrgPriceRollup
+    if zip is not None:
+        zip3 = zip.zfill(5)[:3] if len(zip) > 3 else zip
+        states = select(rollup.state).where(rollup.drg_code == code, rollup.zip3 == zip3)
+        scope = or_(
+            rollup.state.is_(None),
+            rollup.zip3 == zip3,
+            and_(rollup.zip3.is_(None), rollup.state.in_(states)),
+        )
+    elif state is not None:
+        scope = or_(rollup.state.is_(None), rollup.state == state.upper())
+    else:
+        scope = rollup.zip3.is_(None)
+
+    result = await timed("db", db.execute(select(rollup).where(rollup.drg_code == code, scope)))
+    rows = result.scalars().all()
+    record_rows("db", len(rows))
+    if not rows:
+        raise HTTPException(status_code=404, detail=f"No price rollup for DRG {code}")
+
+    # National, then states, then ZIP3s
+    rows.sort(key=lambda r: (r.state is not None, r.zip3 is not None, r.state or "", r.zip3 or ""))
+    return {
+        "drg_code": code,
+        "drg_description": rows[0].drg_description,
+        "rollups": [to_rollup(row) for row in rows],
+    }
+
+def to_rollup(row: DrgPriceRollup) -> dict:
+    """One rollup row in the DrgRollup shape"""
+    return {
+        "state": row.state,
+        "zip3": row.zip3,
+        "provider_count": row.provider_count,
+        "total_discharges": row.total_discharges,
+        **{
+            price: {statistic: getattr(row, f"{price}_{statistic}") for statistic in STATISTICS}
+            for price in PRICES
+        },
+    }
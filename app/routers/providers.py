@@ -1,69 +1,387 @@
-from fastapi import APIRouter, Query, Depends
+import math
+import os
+from collections import defaultdict
+from contextlib import aclosing
+from operator import itemgetter
+from typing import Optional
+
+from fastapi import APIRouter, Query, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select, or_
 
 
-from app.database import get_db
+from app.database import any_of, get_db, AsyncSessionLocal
 from app.models import Provider, Procedure, Rating
-from app.schemas import ProviderSearchResponse, ProviderResponse
-from app.utils.location import calculate_distance
+from app.schemas import ProviderBatchRequest, ProviderBatchResponse, ProviderSearchResponse
+from app.utils.columnar import get_columnar_store
+from app.utils.drg_index import get_drg_index
+from app.utils.generation import get_dataset_generation, on_generation_change
+from app.utils.location import bounding_box, get_zip_coordinates, get_neighbors
+from app.utils.lru import LRUCache
+from app.utils.serialization import dumps
+from app.utils.singleflight import SingleFlight
+from app.utils.paging import SORTS, TopK, decode_cursor, encode_cursor, sort_key
+from app.utils.timing import record_rows, stage, timed
 
 router = APIRouter()
 
+MAX_LIMIT = 1000
+NDJSON = "application/x-ndjson"
+
+# Encoded responses keyed by (dataset generation, drg, zip, radius_km, sort, limit, cursor)
+result_cache = LRUCache(
+    max_entries=int(os.getenv("RESULT_CACHE_SIZE", "4096")),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+on_generation_change(result_cache.clear)
+
+# Identical searches arriving while one is running wait for its result
+search_flight = SingleFlight("providers")
+
 @router.get("/providers", response_model=ProviderSearchResponse)
 async def search_providers(
+    request: Request,
     drg: str = Query(..., description="DRG code or description to search"),
-    zip: str = Query(..., description="ZIP code to search from"), 
-    radius_km: float = Query(50, description="Search radius in kilometers"),
+    zip: str = Query(..., description="ZIP code to search from"),
+    radius_km: float = Query(50, gt=0, description="Search radius in kilometers"),
+    sort: str = Query("price", pattern=f"^({'|'.join(SORTS)})$", description="Order by price, distance or rating"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description="Page size (all results if omitted)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search for hospitals offering a DRG within a radius of a ZIP code
+
+    Send `Accept: application/x-ndjson` to stream one provider per line,
+    followed by a final {"total_found", "next_cursor"} line.
+    """
+    drg, zip = drg.strip(), zip.strip()
+    # FastAPI 0.109 doesn't pass allow_inf_nan through to query parameters
+    if not math.isfinite(radius_km):
+        raise HTTPException(status_code=422, detail="radius_km must be a finite number")
+    try:
+        after = decode_cursor(cursor, sort) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(
+            stream_providers(drg, zip, radius_km, sort, limit, after),
+            media_type=NDJSON
+        )
+
+    # A new ETL load bumps the generation, so stale entries are never hit
+    generation = await get_dataset_generation(db)
+    key = (generation, drg.lower(), zip, radius_km, sort, limit, cursor)
+
+    body = result_cache.get(key)
+    if body is None:
+        async def search() -> bytes:
+            response = await find_providers(db, drg, zip, radius_km, sort, limit, after)
+            with stage("serialize"):
+                body = dumps(response)
+            result_cache.put(key, body)
+            return body
+
+        body = await search_flight.do(key, search)
+
+    return Response(content=body, media_type="application/json")
+
+@router.post("/providers/batch", response_model=ProviderBatchResponse)
+async def search_providers_batch(
+    request: ProviderBatchRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """Search for hospitals offering a DRG within a radius of a ZIP code"""
-    
-    # Build query
+    """Run several DRG + radius searches at once, in the /providers response shape
+
+    Cached searches are reused; the rest share one SQL query over the union of
+    their DRGs and nearby providers.
+    """
+    generation = await get_dataset_generation(db)
+    queries = [q.model_copy(update={"drg": q.drg.strip(), "zip": q.zip.strip()}) for q in request.queries]
+    keys = [(generation, q.drg.lower(), q.zip, q.radius_km, q.sort, q.limit, None) for q in queries]
+
+    # Same cache entries as GET /providers; identical queries in a batch run once
+    bodies = [result_cache.get(key) for key in keys]
+    pending = {}
+    for i, body in enumerate(bodies):
+        if body is None:
+            pending.setdefault(keys[i], i)
+
+    if pending:
+        responses = await find_providers_batch(db, [queries[i] for i in pending.values()])
+        with stage("serialize"):
+            encoded = {key: dumps(response) for key, response in zip(pending, responses)}
+        for key, body in encoded.items():
+            result_cache.put(key, body)
+        bodies = [body if body is not None else encoded[key] for key, body in zip(keys, bodies)]
+
+    return Response(content=b'{"results":[' + b",".join(bodies) + b"]}", media_type="application/json")
+
+def to_response(procedure, provider, rating, distance: float) -> dict:
+    """One result in the ProviderResponse shape, as a plain dict (no per-row validation)"""
+    return {
+        "provider_id": provider.provider_id,
+        "name": provider.name,
+        "city": provider.city,
+        "state": provider.state,
+        "zip_code": provider.zip_code,
+        "distance_km": round(distance, 2),
+        "avg_covered_charges": procedure.avg_covered_charges,
+        "avg_total_payments": procedure.avg_total_payments,
+        "avg_medicare_payments": procedure.avg_medicare_payments,
+        "total_discharges": procedure.total_discharges,
+        "rating": rating.rating if rating else None,
+        "drg_code": procedure.drg_code,
+        "drg_description": procedure.drg_description,
+    }
+
+async def resolve_drg_codes(db: AsyncSession, drg: str) -> list:
+    """DRG codes a search term matches (descriptions go through the in-process index)"""
+    if drg.isdigit():
+        return [drg]
+    drg_index = await get_drg_index(db)
+    with stage("drg_index"):
+        return drg_index.search(drg)
+
+def to_page(items: list, sort: str, limit: Optional[int], total: Optional[int] = None) -> dict:
+    """Cut ordered (sort_key, result) items to a ProviderSearchResponse-shaped page
+
+    total is the search's match count over every page; pass it whenever items
+    is not the complete result (cut at limit + 1 or resumed from a cursor).
+    """
+    if total is None:
+        total = len(items)
+    next_cursor = None
+    if limit and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(sort, items[-1][0])
+
+    return {
+        "total_found": total,
+        "providers": [response for _, response in items],
+        "next_cursor": next_cursor,
+    }
+
+async def count_providers(db: AsyncSession, drg: str, zip: str, radius_km: float) -> int:
+    """Total results of a search over every page, without building them"""
+    neighbors = await get_neighbors(db, zip, radius_km)
+    if not neighbors:
+        return 0
+    drg_codes = await resolve_drg_codes(db, drg)
+    if not drg_codes:
+        return 0
+
+    store = await get_columnar_store(db)
+    if store is not None:
+        return store.count(drg_codes, neighbors)
+
+    # Procedures are unique per (provider, DRG), and neighbors are exactly the providers inside the radius
+    query = select(func.count()).select_from(Procedure).where(
+        any_of(db, Procedure.drg_code, drg_codes),
+        any_of(db, Procedure.provider_id, neighbors.provider_ids.tolist())
+    )
+    return (await db.execute(query)).scalar()
+
+async def iter_providers(db: AsyncSession, drg: str, zip: str, radius_km: float,
+                         sort: str = "price", limit: Optional[int] = None, after: Optional[tuple] = None):
+    """Yield (sort_key, result dict) in final order, after the cursor key
+
+    With the columnar engine enabled the search runs over in-memory arrays.
+    Otherwise price and rating orders are pushed into SQL so rows can be
+    yielded while they are still streaming off the database cursor, and
+    distance order keeps a bounded top-k of limit + 1 rows.
+    """
+
+    # Find providers within the radius (cached per origin ZIP)
+    neighbors = await timed("neighbors", get_neighbors(db, zip, radius_km))
+    if not neighbors:
+        return
+
+    drg_codes = await resolve_drg_codes(db, drg)
+    if not drg_codes:
+        return
+
+    store = await get_columnar_store(db)
+    if store is not None:
+        with stage("columnar"):
+            matches = store.search(drg_codes, neighbors, sort, limit, after)
+        record_rows("columnar", len(matches))
+        for key, row, distance in matches:
+            yield key, store.response(row, distance)
+        return
+
+    # Build query, with a bounding box so far-away rows never leave the database
+    nearby = neighbors.distance_map()
+    origin = get_zip_coordinates(zip)
+    min_lat, max_lat, min_lng, max_lng = bounding_box(origin[0], origin[1], radius_km)
     query = select(Procedure, Provider, Rating).join(
         Provider, Procedure.provider_id == Provider.provider_id
     ).outerjoin(
         Rating, Provider.provider_id == Rating.provider_id
+    ).where(
+        Provider.lat.between(min_lat, max_lat),
+        Provider.lng.between(min_lng, max_lng)
     )
-    
-    # Filter by DRG
-    if drg.isdigit():
-        query = query.where(Procedure.drg_code == drg)
-    else:
-        query = query.where(Procedure.drg_description.ilike(f"%{drg}%"))
-    
-    # Execute query
-    result = await db.execute(query)
-    rows = result.all()
-    
-    # Filter by distance
-    providers_list = []
-    for procedure, provider, rating in rows:
-        # Calculate real distance
-        distance = calculate_distance(zip, provider.zip_code)
-        
-        # Only include if within radius
-        if distance <= radius_km:
-            providers_list.append(ProviderResponse(
-                provider_id=provider.provider_id,
-                name=provider.name,
-                city=provider.city,
-                state=provider.state,
-                zip_code=provider.zip_code,
-                distance_km=round(distance, 2),
-                avg_covered_charges=procedure.avg_covered_charges,
-                avg_total_payments=procedure.avg_total_payments,
-                avg_medicare_payments=procedure.avg_medicare_payments,
-                total_discharges=procedure.total_discharges,
-                rating=rating.rating if rating else None,
-                drg_code=procedure.drg_code,
-                drg_description=procedure.drg_description
-            ))
-    
-    # Sort by price (cheapest first)
-    providers_list.sort(key=lambda x: x.avg_covered_charges)
-    
-    return ProviderSearchResponse(
-        total_found=len(providers_list),
-        providers=providers_list
-    )
\ No newline at end of file
+
+    # Filter by DRG code so the drg_code index is used; any_of keeps one prepared statement per sort
+    query = query.where(any_of(db, Procedure.drg_code, drg_codes))
+
+    # Order by the sort column in SQL and skip pages before the cursor
+    if sort == "price":
+        query = query.order_by(Procedure.avg_covered_charges)
+        if after:
+            query = query.where(Procedure.avg_covered_charges >= after[0])
+    elif sort == "rating":
+        query = query.order_by(Rating.rating.desc().nullslast())
+        if after:
+            query = query.where(
+                Rating.rating.is_(None) if after[0] == 1
+                else or_(Rating.rating <= -after[0], Rating.rating.is_(None))
+            )
+
+    result = await timed("db", db.stream(query))
+    scanned = inside = 0
+    try:
+        if sort == "distance":
+            top = TopK(limit + 1 if limit else None, key=itemgetter(0))
+            async for procedure, provider, rating in result:
+                scanned += 1
+                distance = nearby.get(provider.provider_id)
+                if distance is None:
+                    continue  # Bounding-box corner outside the radius
+                inside += 1
+                key = sort_key(sort, procedure, provider, rating, distance)
+                if after is None or key > after:
+                    top.push((key, procedure, provider, rating, distance))
+            for key, *row in top.result():
+                yield key, to_response(*row)
+            return
+
+        # Rows arrive ordered by the sort column; order ties by the full key before yielding
+        ties, tie_value = [], None
+        async for procedure, provider, rating in result:
+            scanned += 1
+            distance = nearby.get(provider.provider_id)
+            if distance is None:
+                continue
+            inside += 1
+            key = sort_key(sort, procedure, provider, rating, distance)
+            if ties and key[0] != tie_value:
+                for tied_key, *row in sorted(ties, key=itemgetter(0)):
+                    yield tied_key, to_response(*row)
+                ties = []
+            if after is None or key > after:
+                ties.append((key, procedure, provider, rating, distance))
+                tie_value = key[0]
+        for key, *row in sorted(ties, key=itemgetter(0)):
+            yield key, to_response(*row)
+    finally:
+        await result.close()
+        record_rows("db", scanned)
+        record_rows("distance_filter", inside)
+
+async def find_providers(db: AsyncSession, drg: str, zip: str, radius_km: float, sort: str = "price",
+                         limit: Optional[int] = None, after: Optional[tuple] = None) -> dict:
+    """Run the DRG + radius search against the database, one page at a time"""
+    items = []
+    async with aclosing(iter_providers(db, drg, zip, radius_km, sort, limit, after)) as matches:
+        async for item in matches:
+            items.append(item)
+            if limit and len(items) > limit:
+                break
+
+    # A cut or resumed page doesn't hold every match; count them separately
+    total = None
+    if after is not None or (limit and len(items) > limit):
+        total = await timed("count", count_providers(db, drg, zip, radius_km))
+    return to_page(items, sort, limit, total)
+
+async def find_providers_batch(db: AsyncSession, queries: list) -> list:
+    """Answer several searches with one SQL query, returning a ProviderSearchResponse-shaped page per query"""
+    plans = []
+    for q in queries:
+        neighbors = await timed("neighbors", get_neighbors(db, q.zip, q.radius_km))
+        drg_codes = await resolve_drg_codes(db, q.drg) if neighbors else []
+        plans.append((q, drg_codes, neighbors))
+
+    store = await get_columnar_store(db)
+    if store is not None:
+        results = []
+        with stage("columnar"):
+            for q, drg_codes, neighbors in plans:
+                matches = store.search(drg_codes, neighbors, q.sort, q.limit) if drg_codes else []
+                total = store.count(drg_codes, neighbors) if q.limit and len(matches) > q.limit else None
+                results.append(to_page(
+                    [(key, store.response(row, distance)) for key, row, distance in matches], q.sort, q.limit, total
+                ))
+        return results
+
+    # One query over the union of every search's DRGs and nearby providers
+    searched = [(drg_codes, neighbors) for _, drg_codes, neighbors in plans if drg_codes]
+    all_codes = sorted({code for drg_codes, _ in searched for code in drg_codes})
+    all_providers = sorted({pid for _, neighbors in searched for pid in neighbors.provider_ids.tolist()})
+
+    rows_by_code = defaultdict(list)
+    if all_codes and all_providers:
+        query = select(Procedure, Provider, Rating).join(
+            Provider, Procedure.provider_id == Provider.provider_id
+        ).outerjoin(
+            Rating, Provider.provider_id == Rating.provider_id
+        ).where(
+            any_of(db, Procedure.drg_code, all_codes),
+            any_of(db, Provider.provider_id, all_providers)
+        )
+        with stage("db"):
+            rows = (await db.execute(query)).all()
+        record_rows("db", len(rows))
+        for procedure, provider, rating in rows:
+            rows_by_code[procedure.drg_code].append((procedure, provider, rating))
+
+    # Fan rows back out per search, with distances computed once per origin
+    results = []
+    distance_maps = {}
+    with stage("distance_filter"):
+        for q, drg_codes, neighbors in plans:
+            if not drg_codes:
+                results.append(to_page([], q.sort, q.limit))
+                continue
+            nearby = distance_maps.get((q.zip, q.radius_km))
+            if nearby is None:
+                nearby = distance_maps[(q.zip, q.radius_km)] = neighbors.distance_map()
+
+            top = TopK(q.limit + 1 if q.limit else None, key=itemgetter(0))
+            total = 0
+            for code in drg_codes:
+                for procedure, provider, rating in rows_by_code.get(code, ()):
+                    distance = nearby.get(provider.provider_id)
+                    if distance is not None:
+                        key = sort_key(q.sort, procedure, provider, rating, distance)
+                        top.push((key, procedure, provider, rating, distance))
+                        total += 1
+            items = [(key, to_response(*row)) for key, *row in top.result()]
+            results.append(to_page(items, q.sort, q.limit, total))
+    return results
+
+async def stream_providers(drg: str, zip: str, radius_km: float, sort: str,
+                           limit: Optional[int], after: Optional[tuple]):
+    """NDJSON body: one provider per line as it is produced, then a summary line"""
+    # The request's session is closed before a streamed body is sent, so open our own
+    async with AsyncSessionLocal() as db:
+        await get_dataset_generation(db)  # Reloads cached providers and columns after an ETL run
+        count, last_key, more = 0, None, False
+        async with aclosing(iter_providers(db, drg, zip, radius_km, sort, limit, after)) as matches:
+            async for key, response in matches:
+                if limit and count == limit:
+                    more = True
+                    break
+                yield dumps(response) + b"\n"
+                count, last_key = count + 1, key
+
+        total = count
+        if more or after is not None:
+            total = await count_providers(db, drg, zip, radius_km)
+        yield dumps({
+            "total_found": total,
+            "next_cursor": encode_cursor(sort, last_key) if more else None
+        }) + b"\n"
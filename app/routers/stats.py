@@ -0,0 +1,68 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.database import pool_counters, pool_stats, pool_wait_seconds
+from app.routers import ai_assistant, providers
+from app.utils import location, metrics, sql_guard
+from app.utils.singleflight import flight_stats
+from app.utils.translation_cache import get_translation_cache
+
+router = APIRouter()
+
+@router.get("/stats/cache")
+async def cache_stats():
+    """Hit/miss counters and sizes for the in-process caches"""
+    return {
+        "result_cache": providers.result_cache.stats(),
+        "neighbor_cache": location.neighbor_cache.stats(),
+        "provider_index_loaded": location.provider_index is not None,
+        "translation_cache": get_translation_cache().stats(),
+        "sql_plan_cache": sql_guard.plan_cache.stats(),
+    }
+
+@router.get("/stats/ask")
+async def ask_stats():
+    """/ask template fast-path hit rate and shadow comparison counters"""
+    return ai_assistant.intent_stats()
+
+@router.get("/stats/singleflight")
+async def singleflight_stats():
+    """In-flight computations, current and peak waiters, and coalesced request counts"""
+    return flight_stats()
+
+@router.get("/stats/pool")
+async def connection_pool_stats():
+    """Connection pool occupancy, checkout counters and pool wait-time histogram"""
+    return pool_stats()
+
+@router.delete("/stats/cache")
+async def invalidate_caches():
+    """Drop cached provider data, e.g. after the ETL has reloaded providers"""
+    location.invalidate_provider_cache()
+    providers.result_cache.clear()
+    return {"invalidated": True}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage/request latency histograms, row counts, pool and cache counters (Prometheus text format)"""
+    caches = {
+        "result": providers.result_cache.stats(),
+        "neighbor": location.neighbor_cache.stats(),
+        "translation": get_translation_cache().stats(),
+        "sql_plan": sql_guard.plan_cache.stats(),
+    }
+    lines = metrics.histogram_lines("app_db_pool_wait_seconds", "Time checkouts waited for a pooled connection", pool_wait_seconds)
+    lines += metrics.gauge_lines("app_db_pool_events_total", "Connection pool events", "event", pool_counters, "counter")
+    lines += metrics.gauge_lines("app_cache_hits_total", "Cache hits", "cache", {k: v["hits"] for k, v in caches.items()}, "counter")
+    lines += metrics.gauge_lines("app_cache_misses_total", "Cache misses", "cache", {k: v["misses"] for k, v in caches.items()}, "counter")
+    lines += metrics.gauge_lines("app_sql_guard_rejections_total", "Generated SQL statements rejected by the cost guard", "reason", sql_guard.rejections, "counter")
+    lines += metrics.gauge_lines("app_sql_guard_statements_total", "Generated SQL statements checked and result sets truncated", "event", sql_guard.guard_counters, "counter")
+    lines += metrics.gauge_lines("app_ask_intent_total", "/ask questions answered from a SQL template, by intent (miss = LLM)", "intent", ai_assistant.intent_counters, "counter")
+    lines += metrics.gauge_lines("app_ask_shadow_total", "Template answers compared against the LLM in shadow mode", "result", ai_assistant.shadow_counters, "counter")
+    flights = flight_stats()
+    lines += metrics.gauge_lines("app_singleflight_leaders_total", "Coalesced computations actually run", "flight", {k: v["leaders"] for k, v in flights.items()}, "counter")
+    lines += metrics.gauge_lines("app_singleflight_coalesced_total", "Requests answered by another request's in-flight computation", "flight", {k: v["coalesced"] for k, v in flights.items()}, "counter")
+    lines += metrics.gauge_lines("app_singleflight_waiters", "Requests currently waiting on an in-flight computation", "flight", {k: v["waiters"] for k, v in flights.items()})
+    lines += metrics.gauge_lines("app_cache_entries", "Cached entries", "cache", {k: v["entries"] for k, v in caches.items()})
+    return PlainTextResponse(metrics.render(lines), media_type="text/plain; version=0.0.4")
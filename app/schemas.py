@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 class ProviderResponse(BaseModel):
@@ -19,10 +19,52 @@ class ProviderResponse(BaseModel):
 class ProviderSearchResponse(BaseModel):
     total_found: int
     providers: List[ProviderResponse]
+    next_cursor: Optional[str] = None  # Set when limit cut the results short
+
+class ProviderQuery(BaseModel):
+    drg: str
+    zip: str
+    radius_km: float = Field(50, gt=0, allow_inf_nan=False)
+    sort: str = Field("price", pattern="^(price|distance|rating)$")
+    limit: Optional[int] = Field(None, ge=1, le=1000)
+
+class ProviderBatchRequest(BaseModel):
+    queries: List[ProviderQuery] = Field(..., min_length=1, max_length=100)
+
+class ProviderBatchResponse(BaseModel):
+    results: List[ProviderSearchResponse]  # One per query, in request order
 
 class AskRequest(BaseModel):
     question: str
 
 class AskResponse(BaseModel):
     answer: str
-    sql_query: Optional[str] = None
\ No newline at end of file
+    sql_query: Optional[str] = None
+    error: Optional[str] = None  # Set when translation or execution failed
+
+class AskBatchRequest(BaseModel):
+    questions: List[AskRequest] = Field(..., min_length=1, max_length=100)
+
+class AskBatchResponse(BaseModel):
+    results: List[AskResponse]  # One per question, in request order
+
+class PriceStats(BaseModel):
+    mean: Optional[float]  # Weighted by total_discharges
+    min: Optional[float]
+    max: Optional[float]
+    p10: Optional[float]
+    p50: Optional[float]
+    p90: Optional[float]
+
+class DrgRollup(BaseModel):
+    state: Optional[str]  # None on the national row
+    zip3: Optional[str]  # None on national and state rows
+    provider_count: int
+    total_discharges: Optional[int]
+    covered_charges: PriceStats
+    total_payments: PriceStats
+
+class DrgStatsResponse(BaseModel):
+    drg_code: str
+    drg_description: str
+    rollups: List[DrgRollup]  # National first, then state, then ZIP3 rows
@@ -0,0 +1,197 @@
+"""Optional in-memory columnar engine for /providers.
+
+The dataset is small and read-only between ETL runs, so with
+COLUMNAR_ENGINE=1 procedures, providers and ratings are held as NumPy column
+arrays and DRG + radius + sort searches are answered with vectorized masks
+instead of a database join. Results (order, tiebreaks and cursors) match the
+SQL path in app/routers/providers.py.
+"""
+import os
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models import Provider, Procedure, Rating
+from app.utils.generation import on_generation_change
+
+COLUMNAR_ENGINE = os.getenv("COLUMNAR_ENGINE", "0").lower() in ("1", "true", "yes")
+
+
+class ColumnarStore:
+    """Procedure rows as column arrays, joined to providers and ratings by position"""
+
+    def __init__(self, providers, procedures, ratings):
+        # Providers sorted by id, so position order is provider_id order
+        providers = sorted(providers, key=lambda p: p.provider_id)
+        self.provider_ids = np.array([p.provider_id for p in providers], dtype=object)
+        self.names = np.array([p.name for p in providers], dtype=object)
+        self.cities = np.array([p.city for p in providers], dtype=object)
+        self.states = np.array([p.state for p in providers], dtype=object)
+        self.zip_codes = np.array([p.zip_code for p in providers], dtype=object)
+
+        # Ratings aligned with providers, NaN when unrated
+        self.ratings = np.full(len(providers), np.nan)
+        rated = [(pid, rating) for pid, rating in ratings]
+        if rated and providers:
+            positions, known = self._provider_positions([pid for pid, _ in rated])
+            self.ratings[positions[known]] = np.array([r for _, r in rated], dtype=float)[known]
+
+        # Procedures that belong to a loaded provider
+        procedures = list(procedures)
+        positions, known = self._provider_positions([p.provider_id for p in procedures])
+        procedures = [p for p, keep in zip(procedures, known) if keep]
+        self.provider_pos = positions[known].astype(np.int32)
+
+        # drg_code as categorical codes; np.unique sorts, so code order is drg_code order
+        self.drg_categories, drg_codes = np.unique(
+            np.array([p.drg_code for p in procedures], dtype=str), return_inverse=True
+        )
+        self.drg_codes = drg_codes.astype(np.int32)
+        self.drg_descriptions = np.array([p.drg_description for p in procedures], dtype=object)
+        self.covered_charges = np.array([p.avg_covered_charges for p in procedures], dtype=np.float64)
+        self.total_payments = np.array([p.avg_total_payments for p in procedures], dtype=np.float64)
+        self.medicare_payments = np.array([p.avg_medicare_payments for p in procedures], dtype=np.float64)
+        self.discharges = np.array([p.total_discharges for p in procedures], dtype=object)
+
+        # Row positions per DRG category, for O(matches) filtering
+        order = np.argsort(self.drg_codes, kind="stable")
+        bounds = np.searchsorted(self.drg_codes[order], np.arange(len(self.drg_categories) + 1))
+        self.rows_by_drg = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.drg_categories))]
+
+    def __len__(self):
+        return len(self.drg_codes)
+
+    def _provider_positions(self, provider_ids):
+        """(positions, found mask) of provider ids in the sorted provider array"""
+        ids = np.array(provider_ids, dtype=object)
+        if not len(self.provider_ids):
+            return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.provider_ids, ids), len(self.provider_ids) - 1)
+        return positions, self.provider_ids[positions] == ids
+
+    def _rows_for(self, drg_codes) -> np.ndarray:
+        categories = np.searchsorted(self.drg_categories, drg_codes)
+        rows = [
+            self.rows_by_drg[c] for c, code in zip(categories, drg_codes)
+            if c < len(self.drg_categories) and self.drg_categories[c] == code
+        ]
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def _primary(self, sort: str, rows, distances) -> np.ndarray:
+        """First element of paging.sort_key, vectorized"""
+        if sort == "price":
+            return self.covered_charges[rows]
+        if sort == "distance":
+            return distances
+        ratings = self.ratings[self.provider_pos[rows]]
+        return np.where(np.isnan(ratings), 1.0, -ratings)  # Best rated first, unrated last
+
+    def _after(self, primary, provider_pos, drg_codes, after) -> np.ndarray:
+        """Mask of rows whose (primary, provider_id, drg_code) key sorts after the cursor key"""
+        value, provider_id, drg_code = after
+        # Positions > provider_id are exactly those >= its right insertion point
+        provider_right = np.searchsorted(self.provider_ids, np.array([provider_id], dtype=object), side="right")[0]
+        drg_right = np.searchsorted(self.drg_categories, drg_code, side="right")
+        return (primary > value) | (primary == value) & (
+            (provider_pos >= provider_right)
+            | (provider_pos == provider_right - 1) & (self.provider_ids[provider_right - 1] == provider_id)
+            & (drg_codes >= drg_right)
+        )
+
+    def search(self, drg_codes, neighbors, sort: str = "price", limit=None, after=None) -> list:
+        """(sort_key, row, distance_km) for matching rows in final order, at most limit + 1"""
+        rows = self._rows_for(drg_codes)
+        if not len(rows) or not len(neighbors):
+            return []
+
+        # Distance per provider position; providers outside the radius stay inf
+        provider_distances = np.full(len(self.provider_ids), np.inf)
+        positions, known = self._provider_positions(neighbors.provider_ids)
+        provider_distances[positions[known]] = neighbors.distances_km[known]
+
+        distances = provider_distances[self.provider_pos[rows]]
+        inside = np.isfinite(distances)
+        rows, distances = rows[inside], distances[inside]
+
+        primary = self._primary(sort, rows, distances)
+        provider_pos = self.provider_pos[rows]
+        drg_categories = self.drg_codes[rows]
+
+        if after is not None:
+            keep = self._after(primary, provider_pos, drg_categories, after)
+            rows, distances, primary = rows[keep], distances[keep], primary[keep]
+            provider_pos, drg_categories = provider_pos[keep], drg_categories[keep]
+
+        # Top-k: drop rows past the (limit + 1)th primary value before the full sort
+        take = limit + 1 if limit else None
+        if take and len(rows) > take:
+            cutoff = np.partition(primary, take - 1)[take - 1]
+            keep = primary <= cutoff
+            rows, distances, primary = rows[keep], distances[keep], primary[keep]
+            provider_pos, drg_categories = provider_pos[keep], drg_categories[keep]
+
+        order = np.lexsort((drg_categories, provider_pos, primary))[:take]
+        return [
+            ((float(primary[i]) if sort != "rating" else int(primary[i]),
+              self.provider_ids[provider_pos[i]], str(self.drg_categories[drg_categories[i]])),
+             int(rows[i]), float(distances[i]))
+            for i in order
+        ]
+
+    def count(self, drg_codes, neighbors) -> int:
+        """Number of rows search() matches over every page, ignoring cursor and limit"""
+        rows = self._rows_for(drg_codes)
+        if not len(rows) or not len(neighbors):
+            return 0
+        inside = np.zeros(len(self.provider_ids), dtype=bool)
+        positions, known = self._provider_positions(neighbors.provider_ids)
+        inside[positions[known]] = True
+        return int(inside[self.provider_pos[rows]].sum())
+
+    def response(self, row: int, distance: float) -> dict:
+        """One result in the ProviderResponse shape, as a plain dict"""
+        provider = self.provider_pos[row]
+        rating = self.ratings[provider]
+        return {
+            "provider_id": self.provider_ids[provider],
+            "name": self.names[provider],
+            "city": self.cities[provider],
+            "state": self.states[provider],
+            "zip_code": self.zip_codes[provider],
+            "distance_km": round(distance, 2),
+            "avg_covered_charges": float(self.covered_charges[row]),
+            "avg_total_payments": float(self.total_payments[row]),
+            "avg_medicare_payments": float(self.medicare_payments[row]),
+            "total_discharges": self.discharges[row],
+            "rating": None if np.isnan(rating) else int(rating),
+            "drg_code": str(self.drg_categories[self.drg_codes[row]]),
+            "drg_description": self.drg_descriptions[row],
+        }
+
+
+# Shared store, loaded from the database on first use when enabled
+columnar_store = None
+
+async def get_columnar_store(db):
+    """Return the shared store (loading it on first use), or None when the engine is disabled"""
+    global columnar_store
+    if not COLUMNAR_ENGINE:
+        return None
+    if columnar_store is None:
+        providers = (await db.execute(select(
+            Provider.provider_id, Provider.name, Provider.city, Provider.state, Provider.zip_code
+        ))).all()
+        procedures = (await db.execute(select(
+            Procedure.provider_id, Procedure.drg_code, Procedure.drg_description,
+            Procedure.avg_covered_charges, Procedure.avg_total_payments,
+            Procedure.avg_medicare_payments, Procedure.total_discharges
+        ))).all()
+        ratings = (await db.execute(select(Rating.provider_id, Rating.rating))).all()
+        columnar_store = ColumnarStore(providers, procedures, ratings)
+    return columnar_store
+
+@on_generation_change
+def invalidate_columnar_store():
+    """Drop the loaded columns so the next search reloads the new dataset"""
+    global columnar_store
+    columnar_store = None
@@ -0,0 +1,157 @@
+"""In-process inverted index over the distinct DRG descriptions.
+
+There are only a few hundred distinct (drg_code, drg_description) pairs, so
+resolving a free-text term to DRG codes here lets the database use the
+drg_code index instead of scanning procedures with ILIKE '%term%'.
+
+Matching falls through three tiers, stopping at the first that finds anything:
+  1. substring  - same results as ILIKE '%term%' (candidates from trigram postings)
+  2. tokens     - every query word is a prefix of a description word ("knee replace")
+  3. fuzzy      - trigram overlap with the description words, for typos ("replacment")
+
+Within the first two tiers, whole-word matches rank above word-prefix matches,
+which rank above matches inside a word; ties go to the shorter description.
+Fuzzy matches are ranked by their trigram overlap.
+"""
+import os
+import re
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from app.models import Procedure
+from app.utils.generation import on_generation_change
+
+FUZZY_THRESHOLD = float(os.getenv("DRG_FUZZY_THRESHOLD", "0.6"))
+FUZZY_LIMIT = int(os.getenv("DRG_FUZZY_LIMIT", "10"))
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def _substring_trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _word_trigrams(words) -> set:
+    grams = set()
+    for word in words:
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class DrgIndex:
+    """Token and trigram postings over DRG descriptions"""
+
+    def __init__(self, entries):
+        self.codes = []
+        self.descriptions = []
+        self.word_grams = []
+        self.substring_postings = defaultdict(set)  # raw trigram -> positions
+        self.token_postings = defaultdict(set)      # word -> positions
+        self.word_gram_postings = defaultdict(set)  # padded word trigram -> positions
+
+        for position, (code, description) in enumerate(sorted(set(entries))):
+            text = description.lower()
+            words = _tokens(text)
+            self.codes.append(code)
+            self.descriptions.append(text)
+            self.word_grams.append(_word_trigrams(words))
+
+            for gram in _substring_trigrams(text):
+                self.substring_postings[gram].add(position)
+            for word in words:
+                self.token_postings[word].add(position)
+            for gram in self.word_grams[-1]:
+                self.word_gram_postings[gram].add(position)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def _substring_matches(self, term: str) -> list:
+        grams = _substring_trigrams(term)
+        if grams:
+            candidates = set.intersection(*(self.substring_postings.get(g, set()) for g in grams))
+        else:
+            candidates = range(len(self.descriptions))  # Terms under 3 chars: scan a few hundred strings
+        matches = [p for p in candidates if term in self.descriptions[p]]
+        whole_word = re.compile(rf"(?<![a-z0-9]){re.escape(term)}(?![a-z0-9])")
+        word_prefix = re.compile(rf"(?<![a-z0-9]){re.escape(term)}")
+
+        def rank(position):
+            text = self.descriptions[position]
+            tier = 0 if whole_word.search(text) else 1 if word_prefix.search(text) else 2
+            return tier, len(text), position
+
+        return sorted(matches, key=rank)
+
+    def _token_matches(self, words: list) -> list:
+        matches = None
+        for word in words:
+            positions = set()
+            for token, token_positions in self.token_postings.items():
+                if token.startswith(word):
+                    positions |= token_positions
+            matches = positions if matches is None else matches & positions
+            if not matches:
+                return []
+
+        def rank(position):
+            exact = all(word in self.token_postings and position in self.token_postings[word] for word in words)
+            return 0 if exact else 1, len(self.descriptions[position]), position
+
+        return sorted(matches, key=rank)
+
+    def _fuzzy_matches(self, words: list) -> list:
+        grams = _word_trigrams(words)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for position in self.word_gram_postings.get(gram, ()):
+                overlap[position] += 1
+
+        scored = [
+            (count / len(grams), position)
+            for position, count in overlap.items()
+            if count / len(grams) >= FUZZY_THRESHOLD
+        ]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [position for _, position in scored[:FUZZY_LIMIT]]
+
+    def covers(self, term: str) -> bool:
+        """True if some description has every word of term as a word prefix"""
+        words = _tokens(term)
+        return bool(words) and bool(self._token_matches(words))
+
+    def search(self, term: str) -> list:
+        """Resolve a free-text term to matching DRG codes, best matches first"""
+        term = " ".join(term.lower().split())
+        words = _tokens(term)
+        if not term:
+            return []
+
+        positions = self._substring_matches(term)
+        if not positions and words:
+            positions = self._token_matches(words) or self._fuzzy_matches(words)
+
+        codes = []
+        for position in positions:
+            if self.codes[position] not in codes:
+                codes.append(self.codes[position])
+        return codes
+
+
+# Shared index, built from the database on first use
+drg_index = None
+
+async def get_drg_index(db) -> DrgIndex:
+    """Return the shared DRG index, building it on first use"""
+    global drg_index
+    if drg_index is None:
+        result = await db.execute(select(Procedure.drg_code, Procedure.drg_description).distinct())
+        drg_index = DrgIndex(result.all())
+    return drg_index
+
+@on_generation_change
+def invalidate_drg_index():
+    global drg_index
+    drg_index = None
@@ -0,0 +1,36 @@
+import os
+import time
+
+from sqlalchemy import select
+
+from app.models import DatasetMeta
+
+# Seconds a generation read is trusted before asking the database again. Cached
+# results can be this stale after an ETL load; 0 checks on every request
+GENERATION_CHECK_INTERVAL = float(os.getenv("GENERATION_CHECK_INTERVAL", "5"))
+
+_generation = None
+_checked_at = 0.0
+_listeners = []
+
+def on_generation_change(callback):
+    """Register a callback to run when the ETL has loaded a new dataset generation"""
+    _listeners.append(callback)
+    return callback
+
+async def get_dataset_generation(db) -> int:
+    """Return the current dataset generation, firing change callbacks when it moves"""
+    global _generation, _checked_at
+    now = time.monotonic()
+    if _generation is not None and now - _checked_at < GENERATION_CHECK_INTERVAL:
+        return _generation
+
+    result = await db.execute(select(DatasetMeta.generation).where(DatasetMeta.id == 1))
+    generation = result.scalar() or 0
+
+    if _generation is not None and generation != _generation:
+        for callback in _listeners:
+            callback()
+
+    _generation, _checked_at = generation, now
+    return generation
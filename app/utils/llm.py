@@ -0,0 +1,137 @@
+import asyncio
+import os
+import random
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")  # e.g. a local stub server for load tests
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))
+
+STUB_SQL = (
+    "SELECT providers.name, providers.city, providers.state, providers.zip_code, "
+    "procedures.avg_covered_charges FROM providers "
+    "JOIN procedures ON providers.provider_id = procedures.provider_id "
+    "WHERE procedures.drg_code = '470' "
+    "ORDER BY procedures.avg_covered_charges ASC LIMIT 10"
+)
+
+
+class OpenAIBackend:
+    """Chat completions through the async OpenAI SDK over a shared connection pool"""
+
+    def __init__(self):
+        # Imported on first use: httpx and the SDK are a large share of app import time
+        import httpx
+        from openai import AsyncOpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+        self.retryable = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONCURRENCY,
+                max_keepalive_connections=LLM_MAX_CONCURRENCY,
+            ),
+            timeout=LLM_TIMEOUT,
+        )
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=LLM_BASE_URL,
+            http_client=self.http_client,
+            max_retries=0,  # Retries are handled by LLMClient
+        )
+
+    async def complete(self, messages: list, max_tokens: int, temperature: float) -> str:
+        response = await self.client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        return response.choices[0].message.content
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+class StubBackend:
+    """Deterministic in-process backend with configurable latency, for load tests"""
+
+    retryable = ()
+
+    def __init__(self):
+        self.latency = float(os.getenv("LLM_STUB_LATENCY", "0.5"))
+        self.response = os.getenv("LLM_STUB_RESPONSE", STUB_SQL)
+
+    async def complete(self, messages: list, max_tokens: int, temperature: float) -> str:
+        await asyncio.sleep(self.latency)
+        return self.response
+
+    async def aclose(self):
+        pass
+
+
+_backends = {
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+}
+
+def register_backend(name: str, factory):
+    """Make a backend selectable through LLM_BACKEND"""
+    _backends[name] = factory
+
+
+class LLMClient:
+    """Concurrency-limited LLM calls with per-call timeouts and retry with backoff"""
+
+    def __init__(self, backend, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 timeout: float = LLM_TIMEOUT, max_retries: int = LLM_MAX_RETRIES,
+                 backoff: float = LLM_BACKOFF):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        import httpx
+        self.retryable = (asyncio.TimeoutError, httpx.TransportError) + tuple(backend.retryable)
+
+    async def complete(self, messages: list, max_tokens: int = 200, temperature: float = 0) -> str:
+        """Return the completion text for a list of chat messages"""
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await asyncio.wait_for(
+                        self.backend.complete(messages, max_tokens, temperature),
+                        timeout=self.timeout,
+                    )
+                except self.retryable:
+                    if attempt == self.max_retries:
+                        raise
+                    # Exponential backoff with jitter
+                    await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+
+_client = None
+
+def get_llm_client() -> LLMClient:
+    """Return the shared LLM client, creating the configured backend on first use"""
+    global _client
+    if _client is None:
+        _client = LLMClient(_backends[LLM_BACKEND]())
+    return _client
+
+async def close_llm_client():
+    """Close the shared client's connection pool"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
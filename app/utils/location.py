@@ -1,27 +1,206 @@
-import pandas as pd
-from geopy.distance import geodesic
+import math
+import os
 
+import numpy as np
+from sqlalchemy import select
 
-# Load ZIP codes once when module is imported
-print("Loading ZIP code database...")
-zip_df = pd.read_csv('dataset/uszips.csv', encoding='latin-1')
-print(f"Loaded {len(zip_df)} ZIP codes")
+from app.models import Provider
+from app.utils.generation import on_generation_change
+from app.utils.lru import LRUCache
+from app.utils.zipstore import open_zip_store
 
-# Create a dictionary for fast lookup
-zip_coords = {}
-for _, row in zip_df.iterrows():
-    zip_coords[str(row['zip'])] = (row['lat'], row['lng'])
+
+EARTH_RADIUS_KM = 6371.0088
+# On the same sphere as haversine_km, so bounding boxes never undershoot its distances
+KM_PER_DEGREE_LAT = EARTH_RADIUS_KM * math.pi / 180
+
+# Neighbour lists are cached per origin at these radii, smaller radii are slices
+RADIUS_BUCKETS_KM = (10, 25, 50, 100, 250, 500, 1000, 2500)
 
 def get_zip_coordinates(zip_code: str):
-    """Get latitude and longitude for a ZIP code from our database"""
-    return zip_coords.get(zip_code)
+    """Get latitude and longitude for a ZIP code from the memory-mapped ZIP store"""
+    return open_zip_store().get(zip_code)
 
 def calculate_distance(zip1: str, zip2: str) -> float:
     """Calculate distance in km between two ZIP codes"""
     coords1 = get_zip_coordinates(zip1)
     coords2 = get_zip_coordinates(zip2)
-    
+
     if coords1 and coords2:
+        from geopy.distance import geodesic  # Off the request path, so imported on first use
         return geodesic(coords1, coords2).kilometers
-    
-    return float('inf')  # If we can't find one of the ZIPs
\ No newline at end of file
+
+    return float('inf')  # If we can't find one of the ZIPs
+
+def bounding_box(lat: float, lng: float, radius_km: float):
+    """Return (min_lat, max_lat, min_lng, max_lng) enclosing a radius around a point"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    # Use the latitude furthest from the equator so the box never undershoots
+    max_abs_lat = min(abs(lat) + dlat, 89.9)
+    dlng = radius_km / (KM_PER_DEGREE_LAT * np.cos(np.radians(max_abs_lat)))
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Vectorized great-circle distance in km from one point to many"""
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Provider coordinates bucketed into a lat/lng grid for radius and k-nearest queries"""
+
+    def __init__(self, provider_ids, zip_codes, lats, lngs, cell_deg: float = 1.0):
+        self.provider_ids = np.asarray(provider_ids, dtype=object)
+        self.zip_codes = np.asarray(zip_codes, dtype=object)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.cell_deg = cell_deg
+
+        # Group provider positions by grid cell
+        rows = np.floor(self.lats / cell_deg).astype(np.int64)
+        cols = np.floor(self.lngs / cell_deg).astype(np.int64)
+        self.cells = {}
+        for position, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+            self.cells.setdefault(cell, []).append(position)
+        self.cells = {cell: np.array(positions, dtype=np.int64) for cell, positions in self.cells.items()}
+
+    def __len__(self):
+        return len(self.provider_ids)
+
+    def _candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions of providers in grid cells overlapping the radius bounding box"""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+
+        row_min = int(np.floor(min_lat / self.cell_deg))
+        row_max = int(np.floor(max_lat / self.cell_deg))
+        col_min = int(np.floor(min_lng / self.cell_deg))
+        col_max = int(np.floor(max_lng / self.cell_deg))
+
+        # Large radii (or boxes crossing the antimeridian) are cheaper as a full scan
+        n_cells = (row_max - row_min + 1) * (col_max - col_min + 1)
+        if n_cells >= len(self.cells) or min_lng < -180 or max_lng > 180:
+            return np.arange(len(self.provider_ids))
+
+        hits = [
+            self.cells[(row, col)]
+            for row in range(row_min, row_max + 1)
+            for col in range(col_min, col_max + 1)
+            if (row, col) in self.cells
+        ]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(hits)
+
+    def _within(self, lat: float, lng: float, radius_km: float):
+        """Return (positions, distances_km) within radius, nearest first"""
+        positions = self._candidates(lat, lng, radius_km)
+        distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+
+        mask = distances <= radius_km
+        positions, distances = positions[mask], distances[mask]
+        order = np.argsort(distances, kind="stable")
+        return positions[order], distances[order]
+
+    def within_radius(self, lat: float, lng: float, radius_km: float):
+        """Return (provider_ids, distances_km) within radius, nearest first"""
+        positions, distances = self._within(lat, lng, radius_km)
+        return self.provider_ids[positions], distances
+
+    def nearest(self, lat: float, lng: float, k: int):
+        """Return (provider_ids, distances_km) of the k nearest providers, nearest first"""
+        radius_km = 50.0
+        while True:
+            ids, distances = self.within_radius(lat, lng, radius_km)
+            # Everything within the searched radius is included, so the first k are exact
+            if len(ids) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                return ids[:k], distances[:k]
+            radius_km *= 2
+
+    def neighbors(self, lat: float, lng: float, radius_km: float) -> "Neighbors":
+        """Return the providers within radius as a Neighbors list"""
+        positions, distances = self._within(lat, lng, radius_km)
+        return Neighbors(self.provider_ids[positions], self.zip_codes[positions], distances)
+
+
+class Neighbors:
+    """Providers around one origin, sorted by distance"""
+
+    __slots__ = ("provider_ids", "zip_codes", "distances_km")
+
+    def __init__(self, provider_ids: np.ndarray, zip_codes: np.ndarray, distances_km: np.ndarray):
+        self.provider_ids = provider_ids
+        self.zip_codes = zip_codes
+        self.distances_km = distances_km
+
+    def __len__(self):
+        return len(self.provider_ids)
+
+    def within(self, radius_km: float) -> "Neighbors":
+        """Slice down to a smaller radius (distances are sorted, so this is a bisect)"""
+        end = int(np.searchsorted(self.distances_km, radius_km, side="right"))
+        return Neighbors(self.provider_ids[:end], self.zip_codes[:end], self.distances_km[:end])
+
+    def distance_map(self) -> dict:
+        """Map provider_id -> distance_km"""
+        return dict(zip(self.provider_ids.tolist(), self.distances_km.tolist()))
+
+    def zip_distance_map(self) -> dict:
+        """Map provider ZIP code -> distance_km"""
+        return dict(zip(self.zip_codes.tolist(), self.distances_km.tolist()))
+
+
+def radius_bucket(radius_km: float) -> float:
+    """Round a radius up to the cache bucket that covers it"""
+    for bucket in RADIUS_BUCKETS_KM:
+        if radius_km <= bucket:
+            return bucket
+    return float(math.ceil(radius_km / 1000) * 1000)
+
+
+# Shared provider index, built from the database on first use
+provider_index = None
+
+# (origin ZIP, radius bucket) -> Neighbors
+neighbor_cache = LRUCache(max_entries=int(os.getenv("NEIGHBOR_CACHE_SIZE", "256")))
+
+async def get_provider_index(db) -> SpatialIndex:
+    """Return the shared provider index, building it on first use"""
+    global provider_index
+    if provider_index is None:
+        result = await db.execute(
+            select(Provider.provider_id, Provider.zip_code, Provider.lat, Provider.lng)
+            .where(Provider.lat.isnot(None))
+        )
+        rows = result.all()
+        provider_index = SpatialIndex(
+            [row.provider_id for row in rows],
+            [row.zip_code for row in rows],
+            [row.lat for row in rows],
+            [row.lng for row in rows],
+        )
+    return provider_index
+
+async def get_neighbors(db, zip_code: str, radius_km: float):
+    """Providers within radius of a ZIP code, nearest first, or None if the ZIP is unknown"""
+    origin = get_zip_coordinates(zip_code)
+    if origin is None:
+        return None
+
+    key = (str(zip_code), radius_bucket(radius_km))
+    neighbors = neighbor_cache.get(key)
+    if neighbors is None:
+        index = await get_provider_index(db)
+        neighbors = index.neighbors(origin[0], origin[1], key[1])
+        neighbor_cache.put(key, neighbors)
+
+    return neighbors.within(radius_km)
+
+@on_generation_change
+def invalidate_provider_cache():
+    """Drop the provider index and cached neighbour lists, e.g. after the ETL reloads providers"""
+    global provider_index
+    provider_index = None
+    neighbor_cache.clear()
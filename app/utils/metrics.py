@@ -0,0 +1,65 @@
+"""Process-local metrics rendered in the Prometheus text format for /metrics."""
+import os
+
+from app.utils.histogram import Histogram
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+
+class HistogramFamily:
+    """Histograms sharing a metric name, one per label value"""
+
+    def __init__(self, name: str, help: str, label: str, buckets):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self.children = {}
+
+    def observe(self, label_value: str, value: float):
+        histogram = self.children.get(label_value)
+        if histogram is None:
+            histogram = self.children[label_value] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, histogram in sorted(self.children.items()):
+            lines.extend(sample_lines(self.name, histogram, f'{self.label}="{label_value}"'))
+        return lines
+
+
+def sample_lines(name: str, histogram: Histogram, labels: str = "") -> list:
+    """Bucket, sum and count samples for one histogram"""
+    snapshot = histogram.snapshot()
+    prefix = labels + "," if labels else ""
+    lines = [f'{name}_bucket{{{prefix}le="{bound}"}} {count}' for bound, count in snapshot["buckets"].items()]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {snapshot['sum']}")
+    lines.append(f"{name}_count{suffix} {snapshot['count']}")
+    return lines
+
+def histogram_lines(name: str, help: str, histogram: Histogram) -> list:
+    """Render a single unlabelled histogram"""
+    return [f"# HELP {name} {help}", f"# TYPE {name} histogram", *sample_lines(name, histogram)]
+
+
+stage_seconds = HistogramFamily("app_stage_seconds", "Time spent per request stage", "stage", SECONDS_BUCKETS)
+stage_rows = HistogramFamily("app_stage_rows", "Rows produced per request stage", "stage", ROWS_BUCKETS)
+request_seconds = HistogramFamily("app_request_seconds", "Time to response start per endpoint", "endpoint", SECONDS_BUCKETS)
+
+def gauge_lines(name: str, help: str, label: str, values: dict, kind: str = "gauge") -> list:
+    """Render {label value: number} as one Prometheus gauge or counter family"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f'{name}{{{label}="{key}"}} {value}' for key, value in sorted(values.items()))
+    return lines
+
+def render(extra_lines=()) -> str:
+    lines = []
+    for family in (request_seconds, stage_seconds, stage_rows):
+        lines.extend(family.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,65 @@
+import base64
+import heapq
+import json
+import math
+
+SORTS = ("price", "distance", "rating")
+
+
+def sort_key(sort: str, procedure, provider, rating, distance: float) -> tuple:
+    """Total ordering for a search result: the sort column, then provider and DRG as tiebreaks"""
+    if sort == "price":
+        primary = procedure.avg_covered_charges
+    elif sort == "distance":
+        primary = distance
+    else:
+        primary = -rating.rating if rating else 1  # Best rated first, unrated last
+    return (primary, provider.provider_id, procedure.drg_code)
+
+def encode_cursor(sort: str, key: tuple) -> str:
+    """Opaque cursor pointing just after the result with this sort key"""
+    payload = json.dumps([sort, *key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    """Sort key encoded in a cursor; ValueError if it is malformed or from another sort"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if not isinstance(payload, list) or len(payload) != 4 or payload[0] != sort:
+        raise ValueError("Cursor does not match this sort order")
+
+    # The key is compared against SQL columns and result keys, so its types must match sort_key's
+    primary, provider_id, drg_code = payload[1:]
+    number = int if sort == "rating" else (int, float)
+    if (isinstance(primary, bool) or not isinstance(primary, number)
+            or not isinstance(provider_id, str) or not isinstance(drg_code, str)):
+        raise ValueError("Malformed cursor")
+    try:
+        finite = math.isfinite(primary)
+    except OverflowError:  # An int too large for a float
+        finite = False
+    if not finite:
+        raise ValueError("Malformed cursor")
+    return primary, provider_id, drg_code
+
+
+class TopK:
+    """Keep the k smallest items by key in O(k) memory (everything, sorted, when k is None)"""
+
+    def __init__(self, k, key):
+        self.k = k
+        self.key = key
+        self.items = []
+
+    def push(self, item):
+        self.items.append(item)
+        # Prune in batches so each push is amortized O(log k)
+        if self.k is not None and len(self.items) >= 2 * self.k + 64:
+            self.items = heapq.nsmallest(self.k, self.items, key=self.key)
+
+    def result(self) -> list:
+        if self.k is None:
+            return sorted(self.items, key=self.key)
+        return heapq.nsmallest(self.k, self.items, key=self.key)
@@ -0,0 +1,19 @@
+"""JSON encoding for hot response paths.
+
+Responses are built as plain dicts and encoded in one pass, skipping
+per-row Pydantic models. Uses orjson when installed (same bytes as Pydantic's
+model_dump_json for these payloads), else compact stdlib json.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional speedup
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    """Encode plain Python data (dicts, lists, str, int, float, None) to compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
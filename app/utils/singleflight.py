@@ -0,0 +1,81 @@
+"""In-process request coalescing.
+
+Concurrent calls with the same key share one in-flight computation: the first
+caller (the leader) runs it and everyone arriving before it finishes awaits
+the same result, or the same exception. Nothing is kept once it completes;
+this only flattens bursts of identical requests, it is not a cache.
+
+If the leader is cancelled its waiters don't inherit the cancellation; the
+first of them to notice runs the computation again as the new leader.
+"""
+import asyncio
+import os
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "1").lower() in ("1", "true", "yes")
+
+# Every SingleFlight by name, for /stats and /metrics
+flights = {}
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with equal keys onto one computation"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.in_flight = {}  # key -> [future, waiter count]
+        self.leaders = 0     # Computations actually run
+        self.coalesced = 0   # Calls answered by another caller's computation
+        self.peak_waiters = 0
+        flights[name] = self
+
+    async def do(self, key, compute):
+        """Return await compute(), shared with concurrent calls for the same key"""
+        if not SINGLEFLIGHT_ENABLED:
+            return await compute()
+
+        while True:
+            entry = self.in_flight.get(key)
+            if entry is None:
+                break
+            entry[1] += 1
+            self.coalesced += 1
+            self.peak_waiters = max(self.peak_waiters, entry[1])
+            try:
+                return await asyncio.shield(entry[0])
+            except asyncio.CancelledError:
+                if not entry[0].cancelled():
+                    raise  # This waiter itself was cancelled
+                self.coalesced -= 1  # The leader went away; take over
+            finally:
+                entry[1] -= 1
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = [future, 0]
+        self.leaders += 1
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved, so an unwaited failure isn't logged twice
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self.in_flight[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self.in_flight),
+            "waiters": sum(waiters for _, waiters in self.in_flight.values()),
+            "peak_waiters": self.peak_waiters,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+def flight_stats() -> dict:
+    return {name: flight.stats() for name, flight in sorted(flights.items())}
@@ -0,0 +1,116 @@
+"""Pre-execution guard for the SQL the LLM generates.
+
+Before a generated statement reaches the database it must be a single
+read-only SELECT. On PostgreSQL its EXPLAIN estimate must also be under
+SQL_GUARD_MAX_COST and SQL_GUARD_MAX_PLAN_ROWS. It then runs under SET LOCAL
+statement_timeout, and at most SQL_GUARD_FETCH_ROWS rows are fetched. Other
+databases get the read-only check and the fetch cap only, since they have no
+plan costs or statement timeouts.
+
+Rejections raise RejectedQuery and are counted by reason for /metrics.
+"""
+import json
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.utils.generation import on_generation_change
+from app.utils.lru import LRUCache
+
+SQL_GUARD_MAX_COST = float(os.getenv("SQL_GUARD_MAX_COST", "1000000"))
+SQL_GUARD_MAX_PLAN_ROWS = float(os.getenv("SQL_GUARD_MAX_PLAN_ROWS", "100000"))
+SQL_GUARD_TIMEOUT_MS = int(os.getenv("SQL_GUARD_TIMEOUT_MS", "5000"))
+SQL_GUARD_FETCH_ROWS = int(os.getenv("SQL_GUARD_FETCH_ROWS", "10000"))
+
+# Words that never belong in a read-only answer query (FOR UPDATE / SELECT INTO included)
+WRITE_KEYWORDS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|DROP|ALTER|CREATE|TRUNCATE|GRANT|REVOKE|"
+    r"COPY|VACUUM|ANALYZE|REINDEX|CLUSTER|CALL|DO|LOCK|SET|RESET|ATTACH|DETACH|PRAGMA|LISTEN|NOTIFY)\b",
+    re.IGNORECASE
+)
+# Server-side functions with side effects or that can stall a backend
+UNSAFE_FUNCTIONS = re.compile(r"\b(pg_\w+|set_config|dblink\w*|lo_\w+|nextval|setval)\s*\(", re.IGNORECASE)
+
+# Rejections by reason, plus checked/truncated totals
+rejections = {"read_only": 0, "cost": 0, "plan_rows": 0, "timeout": 0}
+guard_counters = {"checked": 0, "truncated": 0}
+
+# (total cost, plan rows) per statement, until the next dataset generation
+plan_cache = LRUCache(max_entries=int(os.getenv("SQL_GUARD_PLAN_CACHE_SIZE", "1024")))
+on_generation_change(plan_cache.clear)
+
+
+class RejectedQuery(ValueError):
+    """A generated statement the guard refused to run, with the reason counted in rejections"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _reject(reason: str, message: str):
+    rejections[reason] += 1
+    raise RejectedQuery(reason, message)
+
+def _strip_literals(sql: str) -> str:
+    """Blank out quoted strings/identifiers and comments so keywords inside them are ignored"""
+    return re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", " ", sql, flags=re.DOTALL)
+
+def check_read_only(sql: str):
+    """Raise RejectedQuery unless sql is a single SELECT (or WITH ... SELECT) with no writes"""
+    code = _strip_literals(sql).strip().rstrip(";").strip()
+    if ";" in code:
+        _reject("read_only", "Only a single statement is allowed")
+    if not re.match(r"(SELECT|WITH)\b", code, re.IGNORECASE):
+        _reject("read_only", "Only SELECT statements are allowed")
+    write = WRITE_KEYWORDS.search(code) or UNSAFE_FUNCTIONS.search(code)
+    if write:
+        _reject("read_only", f"{write.group(1).upper()} is not allowed in a read-only query")
+
+async def check_plan(db, sql: str):
+    """Reject statements whose planner estimate exceeds the cost or row limits (PostgreSQL)"""
+    estimate = plan_cache.get(sql)
+    if estimate is None:
+        plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+        if isinstance(plan, str):  # asyncpg hands json back undecoded
+            plan = json.loads(plan)
+        top = plan[0]["Plan"]
+        estimate = (top["Total Cost"], top["Plan Rows"])
+        plan_cache.put(sql, estimate)
+
+    cost, rows = estimate
+    if cost > SQL_GUARD_MAX_COST:
+        _reject("cost", f"Estimated cost {cost:,.0f} is over the limit of {SQL_GUARD_MAX_COST:,.0f}")
+    if rows > SQL_GUARD_MAX_PLAN_ROWS:
+        _reject("plan_rows", f"Estimated {rows:,.0f} rows is over the limit of {SQL_GUARD_MAX_PLAN_ROWS:,.0f}")
+
+async def guarded_fetch(db, sql: str, max_rows: int = SQL_GUARD_FETCH_ROWS) -> list:
+    """Check, then run a generated statement and fetch at most max_rows rows"""
+    guard_counters["checked"] += 1
+    check_read_only(sql)
+
+    postgres = db.bind.dialect.name == "postgresql"
+    try:
+        if postgres:
+            # Scoped to the session's current transaction; reset once the rows are in
+            await db.execute(text(f"SET LOCAL statement_timeout = {SQL_GUARD_TIMEOUT_MS}"))
+            await check_plan(db, sql)
+
+        result = await db.stream(text(sql))
+        rows = await result.fetchmany(max_rows + 1)
+        await result.close()
+
+        if postgres:
+            await db.execute(text("SET LOCAL statement_timeout TO DEFAULT"))
+    except DBAPIError as e:
+        await db.rollback()  # The transaction is aborted on PostgreSQL
+        if "statement timeout" in str(e.orig):
+            _reject("timeout", f"Query ran longer than {SQL_GUARD_TIMEOUT_MS} ms")
+        raise
+
+    if len(rows) > max_rows:
+        guard_counters["truncated"] += 1
+        rows = rows[:max_rows]
+    return rows
@@ -0,0 +1,159 @@
+"""Restricted rewriter for the single SELECT statements the LLM generates.
+
+Only the shape SYSTEM_PROMPT asks for is understood:
+
+    SELECT ... FROM ... [WHERE ...] [GROUP BY ...] [HAVING ...]
+    [ORDER BY ...] [LIMIT n] [OFFSET n]
+
+Clauses are found at the top level only (outside quotes and parentheses), so
+subqueries and string literals are carried through untouched. Anything else
+(CTEs, set operations, several statements) raises UnsupportedQuery and the
+caller falls back to running the statement as generated.
+"""
+import re
+
+CLAUSES = ("SELECT", "FROM", "WHERE", "GROUP BY", "HAVING", "ORDER BY", "LIMIT", "OFFSET")
+UNSUPPORTED = ("WITH", "UNION", "INTERSECT", "EXCEPT", "INTO", "FOR", "FETCH")
+
+# Columns format_answer reads, used when the model asks for SELECT *
+DEFAULT_COLUMNS = ("name", "city", "state", "zip_code")
+
+_KEYWORD = re.compile(
+    r"\b(" + "|".join(k.replace(" ", r"\s+") for k in CLAUSES + UNSUPPORTED) + r")\b",
+    re.IGNORECASE
+)
+_NOT_ALIAS = {"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "ON", "USING", "NATURAL"}
+
+
+class UnsupportedQuery(ValueError):
+    pass
+
+
+def _mask(sql: str) -> str:
+    """Blank out string literals and parenthesised text, keeping offsets"""
+    out = []
+    depth, quote = 0, None
+    for ch in sql:
+        if quote:
+            out.append(" ")
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+            out.append(" ")
+        elif ch == "(":
+            depth += 1
+            out.append(ch if depth == 1 else " ")
+        elif ch == ")":
+            depth -= 1
+            if depth < 0:
+                raise UnsupportedQuery("Unbalanced parentheses")
+            out.append(ch if depth == 0 else " ")
+        else:
+            out.append(ch if depth == 0 else " ")
+    if quote or depth:
+        raise UnsupportedQuery("Unterminated string or parenthesis")
+    return "".join(out)
+
+def parse_select(sql: str) -> dict:
+    """Split a SELECT into its top-level clauses, keyed by CLAUSES names"""
+    sql = sql.strip().rstrip(";").strip()
+    masked = _mask(sql)
+    if ";" in masked:
+        raise UnsupportedQuery("Multiple statements")
+
+    found = []
+    for match in _KEYWORD.finditer(masked):
+        keyword = " ".join(match.group(1).upper().split())
+        if keyword in UNSUPPORTED:
+            raise UnsupportedQuery(f"{keyword} is not supported")
+        found.append((keyword, match.start(), match.end()))
+
+    names = [keyword for keyword, _, _ in found]
+    if not found or found[0][1] != 0 or names[0] != "SELECT" or "FROM" not in names:
+        raise UnsupportedQuery("Not a single SELECT ... FROM statement")
+    if names != sorted(set(names), key=CLAUSES.index):
+        raise UnsupportedQuery("Clauses repeated or out of order")
+
+    clauses = {}
+    for i, (keyword, _, end) in enumerate(found):
+        stop = found[i + 1][1] if i + 1 < len(found) else len(sql)
+        clauses[keyword] = sql[end:stop].strip()
+    return clauses
+
+def to_sql(clauses: dict) -> str:
+    return " ".join(f"{keyword} {clauses[keyword]}" for keyword in CLAUSES if keyword in clauses)
+
+def table_alias(from_clause: str, table: str):
+    """Name the table is referenced by in a FROM clause, or None if it isn't joined"""
+    masked = _mask(from_clause)
+    match = re.search(rf"(?<![\w.]){table}\b(?!\.)(?:\s+(?:AS\s+)?(\w+))?", masked, re.IGNORECASE)
+    if not match:
+        return None
+    alias = match.group(1)
+    if alias and alias.upper() not in _NOT_ALIAS:
+        return alias
+    return table
+
+def reads_table(sql: str, table: str) -> bool:
+    """True if the statement's FROM clause reads the table"""
+    try:
+        return table_alias(parse_select(sql)["FROM"], table) is not None
+    except UnsupportedQuery:
+        return re.search(rf"(?<![\w.]){table}\b", sql, re.IGNORECASE) is not None
+
+def restrict_providers(clauses: dict, provider_ids) -> dict:
+    """AND a providers.provider_id IN (...) predicate into the WHERE clause"""
+    alias = table_alias(clauses["FROM"], "providers")
+    if alias is None:
+        raise UnsupportedQuery("providers is not in the FROM clause")
+
+    if provider_ids:
+        quoted = ", ".join("'" + str(pid).replace("'", "''") + "'" for pid in provider_ids)
+        predicate = f"{alias}.provider_id IN ({quoted})"
+    else:
+        predicate = "1 = 0"
+
+    clauses = dict(clauses)
+    clauses["WHERE"] = f"({clauses['WHERE']}) AND {predicate}" if "WHERE" in clauses else predicate
+    return clauses
+
+def cap_limit(clauses: dict, max_rows: int) -> dict:
+    """Add LIMIT max_rows, or lower an existing LIMIT to it"""
+    clauses = dict(clauses)
+    current = clauses.get("LIMIT", "")
+    if not current.isdigit() or int(current) > max_rows:
+        clauses["LIMIT"] = str(max_rows)
+    return clauses
+
+def prune_columns(clauses: dict) -> dict:
+    """Replace SELECT * with the columns the answer is built from"""
+    select = clauses["SELECT"]
+    distinct = re.match(r"DISTINCT\s+", select, re.IGNORECASE)
+    if (select[distinct.end():] if distinct else select).strip() != "*":
+        return clauses
+
+    alias = table_alias(clauses["FROM"], "providers")
+    if alias is None:
+        return clauses
+    columns = [f"{alias}.{column}" for column in DEFAULT_COLUMNS]
+    # Keep plain ORDER BY columns so the answer shows the value it was ranked by
+    for term in clauses.get("ORDER BY", "").split(","):
+        column = re.match(r"\s*(\w+\.\w+)\s*(?:ASC|DESC)?\s*$", term, re.IGNORECASE)
+        if column and column.group(1) not in columns:
+            columns.append(column.group(1))
+
+    clauses = dict(clauses)
+    clauses["SELECT"] = (distinct.group(0) if distinct else "") + ", ".join(columns)
+    return clauses
+
+def rewrite_select(sql: str, max_rows: int, provider_ids=None) -> str:
+    """Push the location filter and row cap into a generated SELECT
+
+    provider_ids, when given, restricts results to those providers.
+    Raises UnsupportedQuery if the statement is outside the supported shape.
+    """
+    clauses = parse_select(sql)
+    if provider_ids is not None:
+        clauses = restrict_providers(clauses, provider_ids)
+    return to_sql(cap_limit(prune_columns(clauses), max_rows))
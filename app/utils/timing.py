@@ -0,0 +1,90 @@
+"""Per-request stage timers, reported as a Server-Timing header and in /metrics.
+
+    with stage("db"):
+        rows = (await db.execute(query)).all()
+    record_rows("db", len(rows))
+
+Stages with the same name within one request are summed in the header. With
+METRICS_ENABLED=0 timers and row counts are no-ops and the middleware passes
+requests straight through.
+"""
+import time
+from contextvars import ContextVar
+
+from app.utils import metrics
+
+# Stage name -> seconds for the request being handled, None outside a request
+_request_stages = ContextVar("request_stages", default=None)
+
+
+class stage:
+    """Context manager timing one stage of the current request"""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        if metrics.METRICS_ENABLED:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if metrics.METRICS_ENABLED:
+            elapsed = time.perf_counter() - self.started
+            metrics.stage_seconds.observe(self.name, elapsed)
+            stages = _request_stages.get()
+            if stages is not None:
+                stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+async def timed(name: str, awaitable):
+    """Await under a stage timer: rows = await timed("db", db.execute(query))"""
+    with stage(name):
+        return await awaitable
+
+def record_rows(name: str, count: int):
+    """Record how many rows a stage produced"""
+    if metrics.METRICS_ENABLED:
+        metrics.stage_rows.observe(name, count)
+
+def server_timing(stages: dict, total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header and per-endpoint latency histograms
+
+    Timings are taken when the response starts, so a streamed body only
+    reports the stages that ran before its first chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stages = {}
+        token = _request_stages.set(stages)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total = time.perf_counter() - started
+                endpoint = scope.get("endpoint")
+                metrics.request_seconds.observe(endpoint.__name__ if endpoint else "unmatched", total)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(stages, total).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
@@ -0,0 +1,264 @@
+"""Cache of natural-language question -> SQL translations for /ask.
+
+Questions are normalized (case, whitespace, punctuation) and their ZIPs and
+numbers are replaced by placeholders, so "top 3 cheapest for DRG 470" and
+"Top 5 cheapest for DRG 23" share one cached SQL template. A question whose
+values don't each appear exactly once in its SQL is cached verbatim instead.
+Keys include a hash of SYSTEM_PROMPT, so editing the prompt invalidates old
+translations.
+
+Two tiers: an in-memory LRU and an SQLite file that survives restarts.
+Misses fall back to a character-trigram similarity search over the
+in-memory templates to pick up near-duplicate phrasings.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from app.prompts import SYSTEM_PROMPT
+from app.utils.lru import LRUCache
+
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", "translation_cache.sqlite3")
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "1024"))
+TRANSLATION_CACHE_SIMILARITY = float(os.getenv("TRANSLATION_CACHE_SIMILARITY", "0.85"))
+
+STOPWORDS = {
+    "a", "an", "the", "me", "show", "list", "find", "give", "please", "what", "whats",
+    "which", "who", "is", "are", "was", "for", "of", "in", "to", "with", "s", "do", "does",
+}
+
+PARAM_PATTERN = re.compile(r"\b(\d{5})\b|\b(\d+(?:\.\d+)?)\b")
+# Marks key templates of questions cached verbatim (normalized templates never contain it)
+LITERAL_SEPARATOR = " | "
+
+
+def normalize_question(question: str):
+    """Return (template, params) with ZIPs and numbers replaced by placeholders"""
+    params = []
+
+    def placeholder(match):
+        kind = "zip" if match.group(1) else "num"
+        params.append(match.group(0))
+        return f" <{kind}> "
+
+    text = question.lower()
+    text = PARAM_PATTERN.sub(placeholder, text)
+    text = re.sub(r"[^\w<>]+", " ", text)
+    return " ".join(text.split()), params
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _singular(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+def _within_one_edit(a: str, b: str) -> bool:
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = j = edits = 0
+    while i < len(a) and j < len(b):
+        if a[i] != b[j]:
+            edits += 1
+            if edits > 1:
+                return False
+            if len(a) == len(b):
+                i += 1
+            j += 1
+        else:
+            i += 1
+            j += 1
+    return edits + (len(b) - j) <= 1
+
+def _words_compatible(a: str, b: str) -> bool:
+    """True if two templates differ only in stopwords, plurals or single-letter typos"""
+    words_a = [_singular(w) for w in a.split() if w not in STOPWORDS]
+    words_b = [_singular(w) for w in b.split() if w not in STOPWORDS]
+    if len(words_a) != len(words_b):
+        return False
+    for word_a, word_b in zip(words_a, words_b):
+        if word_a == word_b:
+            continue
+        # Only allow typo tolerance on longer words ("knee" vs "knew" must not match)
+        if min(len(word_a), len(word_b)) < 5 or not _within_one_edit(word_a, word_b):
+            return False
+    return True
+
+def _to_sql_template(sql: str, params: list):
+    """Replace question parameters in SQL by {pN} markers
+
+    Returns None unless every parameter is exactly one literal in the SQL: a
+    number the model transformed ("4 stars" -> rating >= 8) or that also
+    appears elsewhere ("DRG 1" ... LIMIT 1) can't be swapped for a new value.
+    """
+    for i, value in enumerate(params):
+        sql, count = re.subn(rf"(?<![\w.]){re.escape(value)}(?![\w.])", f"{{p{i}}}", sql)
+        if count != 1:
+            return None
+    return sql
+
+def _literal_template(template: str, params: list) -> str:
+    """Key template for a question cached verbatim, values included"""
+    return f"{template}{LITERAL_SEPARATOR}{' '.join(params)}" if params else template
+
+def _render(sql_template: str, params: list) -> str:
+    for i, value in enumerate(params):
+        sql_template = sql_template.replace(f"{{p{i}}}", value)
+    return sql_template
+
+
+class TranslationCache:
+    """Two-tier (memory + SQLite) cache of SQL translations keyed by normalized question"""
+
+    def __init__(self, system_prompt: str, path: str = TRANSLATION_CACHE_PATH,
+                 max_entries: int = TRANSLATION_CACHE_SIZE,
+                 similarity: float = TRANSLATION_CACHE_SIMILARITY):
+        self.prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+        self.similarity = similarity
+        self.memory = LRUCache(max_entries=max_entries)
+        self.disk_hits = 0
+        self.similar_hits = 0
+        self.write_errors = 0
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()  # Serializes every use of self.db across threads
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY, prompt_hash TEXT, template TEXT,"
+            " sql_template TEXT, created_at REAL)"
+        )
+        self._warm(max_entries)
+
+    def _key(self, template: str) -> str:
+        return hashlib.sha256(f"{self.prompt_hash}:{template}".encode()).hexdigest()
+
+    def _warm(self, limit: int):
+        """Load the most recent translations for this prompt into memory"""
+        rows = self.db.execute(
+            "SELECT template, sql_template FROM translations WHERE prompt_hash = ?"
+            " ORDER BY created_at DESC LIMIT ?",
+            (self.prompt_hash, limit),
+        ).fetchall()
+        for template, sql_template in reversed(rows):
+            self.memory.put(self._key(template), (template, sql_template, _trigrams(template)))
+
+    def _lookup_keys(self, question: str):
+        """Return the (template, params) keys a question may be cached under, verbatim key first"""
+        template, params = normalize_question(question)
+        keys = [(_literal_template(template, params), [])]
+        # Repeated values can't be mapped back unambiguously, only the verbatim question is cached
+        if params and len(set(params)) == len(params):
+            keys.append((template, params))
+        return keys
+
+    async def get(self, question: str):
+        """Return the cached SQL for a question, or None
+
+        Memory is checked on the event loop; the SQLite tier is read in a
+        worker thread, like writes, so the connection is only ever used
+        under its lock and never blocks other requests.
+        """
+        keys = self._lookup_keys(question)
+
+        template, params = next(((t, p) for t, p in keys if self._key(t) in self.memory), keys[-1])
+        entry = self.memory.get(self._key(template))
+        if entry is not None:
+            return _render(entry[1], params)
+
+        try:
+            found = await asyncio.to_thread(self._read, keys)
+        except sqlite3.Error as e:
+            print(f"⚠️  Translation cache read failed: {e}")
+            found = None
+        if found is not None:
+            template, params, sql_template = found
+            self.disk_hits += 1
+            self.memory.put(self._key(template), (template, sql_template, _trigrams(template)))
+            return _render(sql_template, params)
+
+        template, params = keys[-1]
+        if LITERAL_SEPARATOR not in template:
+            entry = self._most_similar(template)
+            if entry is not None:
+                self.similar_hits += 1
+                return _render(entry[1], params)
+
+        return None
+
+    def _most_similar(self, template: str):
+        grams = _trigrams(template)
+        placeholders = re.findall(r"<\w+>", template)
+        best, best_score = None, self.similarity
+        for entry in self.memory.values():
+            other, _, other_grams = entry
+            if LITERAL_SEPARATOR in other or re.findall(r"<\w+>", other) != placeholders:
+                continue
+            score = len(grams & other_grams) / len(grams | other_grams)
+            if score >= best_score and _words_compatible(template, other):
+                best, best_score = entry, score
+        return best
+
+    async def put(self, question: str, sql: str):
+        """Store the SQL translation of a question in both tiers
+
+        The SQLite write runs in a worker thread; if it fails the translation
+        stays cached in memory and the failure is only logged.
+        """
+        template, params = self._lookup_keys(question)[-1]
+        sql_template = _to_sql_template(sql, params)
+        if sql_template is None:
+            # The values don't map one-to-one onto the SQL; cache this exact question only
+            template, sql_template = _literal_template(template, params), sql
+        key = self._key(template)
+        self.memory.put(key, (template, sql_template, _trigrams(template)))
+        try:
+            await asyncio.to_thread(self._write, key, template, sql_template)
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            print(f"⚠️  Translation cache write failed: {e}")
+
+    def _read(self, keys: list):
+        """(template, params, sql_template) of the first key stored on disk, or None"""
+        with self.lock:
+            for template, params in keys:
+                row = self.db.execute(
+                    "SELECT sql_template FROM translations WHERE key = ?", (self._key(template),)
+                ).fetchone()
+                if row is not None:
+                    return template, params, row[0]
+        return None
+
+    def _write(self, key: str, template: str, sql_template: str):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?)",
+                (key, self.prompt_hash, template, sql_template, time.time()),
+            )
+            self.db.commit()
+
+    def clear(self):
+        self.memory.clear()
+        with self.lock:
+            self.db.execute("DELETE FROM translations")
+            self.db.commit()
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        stats.update(disk_hits=self.disk_hits, similar_hits=self.similar_hits, write_errors=self.write_errors)
+        return stats
+
+
+_cache = None
+
+def get_translation_cache() -> TranslationCache:
+    """Return the shared translation cache for the current SYSTEM_PROMPT"""
+    global _cache
+    if _cache is None:
+        _cache = TranslationCache(SYSTEM_PROMPT)
+    return _cache
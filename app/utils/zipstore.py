@@ -0,0 +1,119 @@
+"""Compact binary ZIP -> (lat, lng) store, memory-mapped for lookups.
+
+File layout (little endian): b"ZIPS", uint32 count, then `count` sorted
+uint32 ZIP keys, `count` float32 latitudes and `count` float32 longitudes.
+Lookups binary-search the key block straight out of the mapping, so every
+worker shares the same page-cache pages and nothing is parsed at startup.
+
+Build it with:  python -m app.utils.zipstore [uszips.csv] [uszips.bin]
+"""
+import bisect
+import csv
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+MAGIC = b"ZIPS"
+HEADER = struct.Struct("<4sI")
+
+ZIP_CSV_PATH = os.getenv("ZIP_CSV_PATH", "dataset/uszips.csv")
+ZIP_STORE_PATH = os.getenv("ZIP_STORE_PATH", "dataset/uszips.bin")
+
+
+def _file_mode() -> int:
+    """Mode open() would give a new file under the current umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def build_zip_store(csv_path: str = ZIP_CSV_PATH, store_path: str = ZIP_STORE_PATH) -> int:
+    """Compile the SimpleMaps ZIP CSV into the binary store, returning the ZIP count"""
+    records = {}
+    with open(csv_path, encoding="latin-1", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                records[int(row["zip"])] = (float(row["lat"]), float(row["lng"]))
+            except (KeyError, ValueError):
+                continue
+
+    keys = sorted(records)
+    blocks = [
+        array("I", keys),
+        array("f", (records[key][0] for key in keys)),
+        array("f", (records[key][1] for key in keys)),
+    ]
+    if sys.byteorder != "little":
+        for block in blocks:
+            block.byteswap()
+
+    # Write to a temp file of our own and rename, so running workers never map a partial
+    # file and workers compiling it concurrently never write into the same one
+    directory = os.path.dirname(os.path.abspath(store_path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=".uszips-", suffix=".tmp", delete=False) as f:
+        try:
+            f.write(HEADER.pack(MAGIC, len(keys)))
+            for block in blocks:
+                block.tofile(f)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.chmod(f.name, _file_mode())  # NamedTemporaryFile creates it owner-only
+    os.replace(f.name, store_path)
+    return len(keys)
+
+
+class ZipStore:
+    """Read-only view over a compiled ZIP store file"""
+
+    def __init__(self, path: str = ZIP_STORE_PATH):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or sys.byteorder != "little":
+            raise ValueError(f"{path} is not a usable ZIP store")
+
+        view = memoryview(self._mmap)
+        start = HEADER.size
+        self.keys = view[start:start + 4 * count].cast("I")
+        self.lats = view[start + 4 * count:start + 8 * count].cast("f")
+        self.lngs = view[start + 8 * count:start + 12 * count].cast("f")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, zip_code):
+        """Return (lat, lng) for a ZIP code, or None if it isn't in the store"""
+        try:
+            key = int(zip_code)
+        except (TypeError, ValueError):
+            return None
+
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return (self.lats[i], self.lngs[i])
+        return None
+
+
+_store = None
+
+def open_zip_store() -> ZipStore:
+    """Return the shared ZIP store, compiling it from the CSV if it hasn't been built"""
+    global _store
+    if _store is None:
+        if not os.path.exists(ZIP_STORE_PATH):
+            print(f"Compiling {ZIP_CSV_PATH} -> {ZIP_STORE_PATH}...")
+            build_zip_store()
+        _store = ZipStore(ZIP_STORE_PATH)
+    return _store
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else ZIP_CSV_PATH
+    store_path = sys.argv[2] if len(sys.argv) > 2 else ZIP_STORE_PATH
+    count = build_zip_store(csv_path, store_path)
+    print(f"✅ Wrote {count} ZIP codes to {store_path} ({os.path.getsize(store_path):,} bytes)")
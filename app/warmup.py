@@ -0,0 +1,106 @@
+"""Startup warmup, run by the lifespan handler before the worker serves traffic.
+
+Builds the in-process indexes and caches that the first requests would
+otherwise build, creates the LLM client, and opens WARMUP_CONNECTIONS pooled
+connections. Each connection runs the hot /providers statements once, so
+asyncpg has them prepared. Step timings, app import time and time to ready
+are kept in startup_report and served by GET /ready.
+"""
+import asyncio
+import inspect
+import os
+import time
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, DB_POOL_SIZE, engine
+from app.models import DatasetMeta
+from app.routers.providers import find_providers
+from app.utils.columnar import get_columnar_store
+from app.utils.drg_index import get_drg_index
+from app.utils.generation import get_dataset_generation
+from app.utils.llm import get_llm_client
+from app.utils.location import get_provider_index
+from app.utils.paging import SORTS
+from app.utils.translation_cache import get_translation_cache
+from app.utils.zipstore import open_zip_store
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1").lower() in ("1", "true", "yes")
+# Connections opened and primed at startup (the pool keeps up to DB_POOL_SIZE)
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", str(DB_POOL_SIZE)))
+
+startup_report = {
+    "ready": False,
+    "import_seconds": None,         # app.main import, set by app.main
+    "warmup_seconds": None,
+    "time_to_ready_seconds": None,  # From the start of the app.main import
+    "steps": {},
+    "error": None,
+}
+_lock = asyncio.Lock()
+
+
+async def _step(name: str, work, required: bool = True):
+    """Run one warmup step (an awaitable or a function), recording its time or its failure"""
+    started = time.perf_counter()
+    try:
+        result = await work if inspect.isawaitable(work) else work()
+    except Exception as e:
+        startup_report["steps"][name] = {"error": str(e)}
+        if required:
+            raise
+        print(f"⚠️  Warmup step {name} failed: {e}")
+        return None
+    startup_report["steps"][name] = {"seconds": round(time.perf_counter() - started, 4)}
+    return result
+
+async def prime_connection(sample):
+    """Check out a connection and run the hot statements on it once"""
+    async with AsyncSessionLocal() as db:
+        await db.connection()
+        await db.execute(select(DatasetMeta.generation).where(DatasetMeta.id == 1))
+        if sample:
+            drg_code, zip_code = sample
+            for sort in SORTS:
+                await find_providers(db, drg_code, zip_code, 50, sort, 10, None)
+
+async def run_warmup(import_started: float = None):
+    """Warm caches and the pool; marks the worker ready, or records why it isn't
+
+    import_started is the perf_counter() reading taken when app.main started importing.
+    """
+    async with _lock:
+        if startup_report["ready"]:
+            return
+        started = time.perf_counter()
+        startup_report["error"] = None
+        try:
+            if WARMUP_ENABLED:
+                async with AsyncSessionLocal() as db:
+                    await _step("generation", get_dataset_generation(db))
+                    drg_index = await _step("drg_index", get_drg_index(db))
+                    provider_index = await _step("provider_index", get_provider_index(db))
+                    await _step("columnar_store", get_columnar_store(db))
+                await _step("zip_store", open_zip_store)
+                await _step("translation_cache", get_translation_cache)
+                await _step("llm_client", get_llm_client, required=False)  # /providers works without it
+
+                # A DRG and a provider ZIP that exist, so the primed statements match real searches
+                sample = None
+                if len(drg_index) and len(provider_index.provider_ids):
+                    sample = (drg_index.codes[0], provider_index.zip_codes[0])
+                # SQLite runs on a NullPool, which keeps no connections to warm
+                connections = WARMUP_CONNECTIONS if hasattr(engine.sync_engine.pool, "size") else 1
+                await _step("pool", asyncio.gather(*(prime_connection(sample) for _ in range(connections))))
+        except Exception as e:
+            startup_report["error"] = str(e)
+            print(f"❌ Warmup failed, not ready: {e}")
+            return
+
+        now = time.perf_counter()
+        startup_report["ready"] = True
+        startup_report["warmup_seconds"] = round(now - started, 4)
+        if import_started is not None:
+            startup_report["time_to_ready_seconds"] = round(now - import_started, 4)
+        print(f"✅ Ready in {startup_report['time_to_ready_seconds']}s "
+              f"(import {startup_report['import_seconds']}s, warmup {startup_report['warmup_seconds']}s)")
@@ -0,0 +1,69 @@
+"""Compare two benchmark result files shape by shape.
+
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+
+Exits 1 if any shape's p50 or p95 got slower by more than --threshold percent,
+or worker import time or time to ready by more than --startup-threshold percent.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+GATED = ("p50_ms", "p95_ms")
+STARTUP_GATED = ("import_seconds", "time_to_ready_seconds")
+
+
+def change(old: float, new: float) -> float:
+    return (new - old) / old * 100 if old else 0.0
+
+def compare(old: dict, new: dict, threshold: float, startup_threshold: float) -> list:
+    """Rows of (shape, metric, old, new, percent change, regressed)"""
+    rows = []
+    for shape, new_result in new.get("shapes", {}).items():
+        old_result = old.get("shapes", {}).get(shape)
+        if not old_result:
+            continue
+        for metric in METRICS:
+            if metric not in old_result or metric not in new_result:
+                continue
+            delta = change(old_result[metric], new_result[metric])
+            rows.append((shape, metric, old_result[metric], new_result[metric], delta,
+                         metric in GATED and delta > threshold))
+
+    for stage in ("etl", "startup", "micro"):
+        for name, old_value in old.get(stage, {}).items():
+            new_value = new.get(stage, {}).get(name)
+            if isinstance(old_value, dict):
+                old_value, new_value = old_value.get("seconds"), (new_value or {}).get("seconds")
+            if isinstance(old_value, (int, float)) and isinstance(new_value, (int, float)):
+                delta = change(old_value, new_value)
+                regressed = stage == "startup" and name in STARTUP_GATED and delta > startup_threshold
+                rows.append((stage, name, old_value, new_value, delta, regressed))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent slowdown that fails")
+    parser.add_argument("--startup-threshold", type=float, default=25.0,
+                        help="percent slower import or time to ready that fails (process timings are noisy)")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    rows = compare(old, new, args.threshold, args.startup_threshold)
+    for shape, metric, old_value, new_value, delta, regressed in rows:
+        flag = "  ❌" if regressed else ""
+        print(f"{shape:32} {metric:24} {old_value:>12} {new_value:>12} {delta:+8.1f}%{flag}")
+
+    regressions = sum(1 for row in rows if row[-1])
+    if regressions:
+        print(f"\n{regressions} regression(s) over the threshold")
+        sys.exit(1)
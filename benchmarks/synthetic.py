@@ -0,0 +1,119 @@
+"""Synthetic dataset shaped like the CMS inpatient file, for offline benchmarks.
+
+Writes the three files etl.py reads into <out_dir>/dataset/:
+  MUP_INP_RY24_P03_V10_DY22_PrvSvc.csv  provider x DRG rows, CMS column names
+  Hospital_General_Information.csv      star ratings for part of the providers
+  uszips.csv                            ZIP -> lat/lng (SimpleMaps columns)
+
+Everything is derived from the seed, so the same arguments give the same files.
+"""
+import argparse
+import csv
+import os
+import random
+
+PROCEDURES_FILE = "MUP_INP_RY24_P03_V10_DY22_PrvSvc.csv"
+RATINGS_FILE = "Hospital_General_Information.csv"
+ZIPS_FILE = "uszips.csv"
+
+STATES = ["AL", "AZ", "CA", "CO", "FL", "GA", "IL", "MA", "MI", "NY", "OH", "PA", "TX", "WA"]
+
+# Words DRG descriptions are assembled from, so description searches hit a realistic mix
+BODY_PARTS = ["HEART", "KNEE", "HIP", "SPINAL", "CARDIAC", "RENAL", "LIVER", "PULMONARY",
+              "INTRACRANIAL", "ESOPHAGEAL", "BOWEL", "VASCULAR", "SHOULDER", "BACK", "NECK"]
+PROCEDURES = ["REPLACEMENT", "FUSION", "SURGERY", "PROCEDURES", "FAILURE", "INFECTION",
+              "TRANSPLANT", "IMPLANT", "BYPASS", "HEMORRHAGE", "DISORDERS", "AMPUTATION"]
+SEVERITIES = ["WITH MCC", "WITH CC", "WITHOUT CC/MCC", "WITH CC OR MCC", "WITHOUT MCC"]
+
+# The DRGs the README and smoke scripts query are always present
+FIXED_DRGS = {
+    "470": "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITHOUT MCC",
+    "23": "CRANIOTOMY WITH MAJOR DEVICE IMPLANT OR ACUTE COMPLEX CNS PRINCIPAL DIAGNOSIS WITH MCC",
+    "291": "HEART FAILURE AND SHOCK WITH MCC",
+}
+
+
+def drg_catalog(count: int, rng: random.Random) -> dict:
+    """DRG code -> description, including FIXED_DRGS"""
+    catalog = dict(FIXED_DRGS)
+    code = 1
+    while len(catalog) < count:
+        if str(code) not in catalog:
+            catalog[str(code)] = " ".join(
+                [rng.choice(BODY_PARTS), rng.choice(PROCEDURES), rng.choice(SEVERITIES)]
+            )
+        code += 1
+    return catalog
+
+def generate(out_dir: str, providers: int = 3000, drgs: int = 500, drgs_per_provider: int = 50,
+             zips: int = 30000, rated_share: float = 0.6, seed: int = 42) -> dict:
+    """Write the synthetic CSVs and return their paths and row counts"""
+    rng = random.Random(seed)
+    dataset_dir = os.path.join(out_dir, "dataset")
+    os.makedirs(dataset_dir, exist_ok=True)
+
+    # ZIPs scattered over the continental US, with providers clustered in "metros"
+    zip_codes = rng.sample(range(1000, 99999), zips)
+    metros = [(rng.uniform(26, 48), rng.uniform(-122, -71)) for _ in range(60)]
+    zip_rows = []
+    for i, zip_code in enumerate(zip_codes):
+        lat, lng = metros[i % len(metros)] if i % 3 else (rng.uniform(25, 49), rng.uniform(-124, -67))
+        zip_rows.append((f"{zip_code:05d}", round(lat + rng.gauss(0, 1.5), 4), round(lng + rng.gauss(0, 1.5), 4)))
+
+    with open(os.path.join(dataset_dir, ZIPS_FILE), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["zip", "lat", "lng", "city", "state_id"])
+        for zip_code, lat, lng in zip_rows:
+            writer.writerow([zip_code, lat, lng, "CITY", rng.choice(STATES)])
+
+    catalog = drg_catalog(drgs, rng)
+    codes = list(catalog)
+    provider_rows = [
+        (f"{100000 + i:06d}", f"SYNTHETIC HOSPITAL {i}", f"CITY {i % 500}", rng.choice(STATES),
+         rng.choice(zip_rows)[0].lstrip("0"))
+        for i in range(providers)
+    ]
+
+    procedure_count = 0
+    with open(os.path.join(dataset_dir, PROCEDURES_FILE), "w", newline="", encoding="latin-1") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Rndrng_Prvdr_CCN", "Rndrng_Prvdr_Org_Name", "Rndrng_Prvdr_City",
+                         "Rndrng_Prvdr_State_Abrvtn", "Rndrng_Prvdr_Zip5", "DRG_Cd", "DRG_Desc",
+                         "Tot_Dschrgs", "Avg_Submtd_Cvrd_Chrg", "Avg_Tot_Pymt_Amt", "Avg_Mdcr_Pymt_Amt"])
+        for provider in provider_rows:
+            for code in rng.sample(codes, min(drgs_per_provider, len(codes))):
+                charges = rng.lognormvariate(11, 0.6)
+                payments = charges * rng.uniform(0.2, 0.5)
+                writer.writerow([*provider, code, catalog[code], rng.randint(11, 400),
+                                 round(charges, 2), round(payments, 2), round(payments * rng.uniform(0.7, 0.95), 2)])
+                procedure_count += 1
+
+    with open(os.path.join(dataset_dir, RATINGS_FILE), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Facility ID", "Facility Name", "Hospital overall rating"])
+        for provider in provider_rows:
+            rated = rng.random() < rated_share
+            writer.writerow([provider[0], provider[1], rng.randint(1, 5) if rated else "Not Available"])
+
+    return {
+        "dir": dataset_dir,
+        "providers": providers,
+        "procedures": procedure_count,
+        "drgs": len(catalog),
+        "zips": zips,
+        "provider_zips": sorted({p[4].zfill(5) for p in provider_rows}),
+        "seed": seed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic CMS-shaped dataset")
+    parser.add_argument("out_dir")
+    parser.add_argument("--providers", type=int, default=3000)
+    parser.add_argument("--drgs", type=int, default=500)
+    parser.add_argument("--drgs-per-provider", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    info = generate(args.out_dir, args.providers, args.drgs, args.drgs_per_provider, seed=args.seed)
+    print(f"Wrote {info['providers']:,} providers, {info['procedures']:,} procedures to {info['dir']}")
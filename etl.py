@@ -1,14 +1,22 @@
 import sys
 sys.path.append('.')  # Add current directory to path
 
+import argparse
+import io
+import queue
+import resource
+import threading
+import time
 import pandas as pd
 import random
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, delete, func, insert, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
 from dotenv import load_dotenv
 import os
 
-from app.models import Base, Provider, Procedure, Rating
+from app.models import Base, Provider, Procedure, Rating, DatasetMeta, DrgPriceRollup
+from app.utils.location import get_zip_coordinates
 
 # Load environment variables
 load_dotenv()
@@ -16,124 +24,507 @@ load_dotenv()
 # Get regular (sync) database URL for ETL
 DATABASE_URL = os.getenv("DATABASE_URL").replace("+asyncpg", "")
 
+PROCEDURES_CSV = 'dataset/MUP_INP_RY24_P03_V10_DY22_PrvSvc.csv'
+RATINGS_CSV = 'dataset/Hospital_General_Information.csv'
+
+# Rows per INSERT batch when COPY isn't available
+BATCH_SIZE = 5000
+
+# Streaming pipeline: CSV rows per chunk and chunks buffered between stages
+CHUNK_SIZE = int(os.getenv("ETL_CHUNK_SIZE", "50000"))
+QUEUE_DEPTH = int(os.getenv("ETL_QUEUE_DEPTH", "2"))
+
+# CSV column -> table column
+PROVIDER_COLUMNS = {
+    'Rndrng_Prvdr_CCN': 'provider_id',
+    'Rndrng_Prvdr_Org_Name': 'name',
+    'Rndrng_Prvdr_City': 'city',
+    'Rndrng_Prvdr_State_Abrvtn': 'state',
+    'Rndrng_Prvdr_Zip5': 'zip_code',
+}
+PROCEDURE_COLUMNS = {
+    'Rndrng_Prvdr_CCN': 'provider_id',
+    'DRG_Cd': 'drg_code',
+    'DRG_Desc': 'drg_description',
+    'Tot_Dschrgs': 'total_discharges',
+    'Avg_Submtd_Cvrd_Chrg': 'avg_covered_charges',
+    'Avg_Tot_Pymt_Amt': 'avg_total_payments',
+    'Avg_Mdcr_Pymt_Amt': 'avg_medicare_payments',
+}
+
+# Natural key of each table, used to match rows between loads
+TABLE_KEYS = {
+    'providers': ['provider_id'],
+    'procedures': ['provider_id', 'drg_code'],
+    'ratings': ['provider_id'],
+}
+
+# Price columns summarised by the DRG rollup: procedures column -> rollup column prefix
+ROLLUP_PRICES = {
+    'avg_covered_charges': 'covered_charges',
+    'avg_total_payments': 'total_payments',
+}
+ROLLUP_PERCENTILES = (10, 50, 90)
+# drg_code / state / ZIP3 grouping sets, national first; ZIPs are zero-padded before taking ZIP3
+ROLLUP_LEVELS = (['drg_code'], ['drg_code', 'state'], ['drg_code', 'state', 'zip3'])
+
 print("Starting ETL process...")
 print(f"Connecting to database...")
 
+def transform_providers(df: pd.DataFrame) -> pd.DataFrame:
+    """Unique providers with coordinates looked up from their ZIP"""
+    providers = df[list(PROVIDER_COLUMNS)].drop_duplicates('Rndrng_Prvdr_CCN').rename(columns=PROVIDER_COLUMNS)
+    providers['provider_id'] = providers['provider_id'].astype(str)
+    providers['zip_code'] = providers['zip_code'].astype(str)
+
+    # Look up each distinct ZIP once
+    coords = {zip_code: get_zip_coordinates(zip_code) for zip_code in providers['zip_code'].unique()}
+    providers['lat'] = providers['zip_code'].map(lambda z: float(coords[z][0]) if coords[z] else None)
+    providers['lng'] = providers['zip_code'].map(lambda z: float(coords[z][1]) if coords[z] else None)
+    return with_row_hash(providers)
+
+def transform_procedures(df: pd.DataFrame) -> pd.DataFrame:
+    """Procedure rows with table column names and types"""
+    procedures = df[list(PROCEDURE_COLUMNS)].rename(columns=PROCEDURE_COLUMNS).astype({
+        'provider_id': str,
+        'drg_code': str,
+        'total_discharges': int,
+        'avg_covered_charges': float,
+        'avg_total_payments': float,
+        'avg_medicare_payments': float,
+    })
+    return with_row_hash(procedures.drop_duplicates(TABLE_KEYS['procedures']))
+
+def transform_ratings(provider_ids, ratings_csv: str = RATINGS_CSV):
+    """Return (ratings, mock_count): real CMS ratings (1-5 stars -> 2-10), mock 4-9 for the rest
+
+    Mock ratings are seeded by provider id so reloads don't churn them.
+    """
+    parts = []
+    for cms_ratings in pd.read_csv(ratings_csv, encoding='utf-8', chunksize=CHUNK_SIZE,
+                                   usecols=['Facility ID', 'Hospital overall rating']):
+        stars = pd.to_numeric(cms_ratings['Hospital overall rating'], errors='coerce')  # 'Not Available' -> NaN
+        parts.append((stars.dropna().astype(int) * 2).set_axis(
+            cms_ratings.loc[stars.notna(), 'Facility ID'].astype(str)
+        ))
+    rating_map = pd.concat(parts) if parts else pd.Series(dtype=int)
+    rating_map = rating_map[~rating_map.index.duplicated()]
+    print(f"Loaded {len(rating_map)} real ratings from CMS data")
+
+    ratings = pd.DataFrame({'provider_id': pd.unique(pd.Series(list(provider_ids), dtype=str))})
+    ratings['rating'] = ratings['provider_id'].map(rating_map)
+    missing = ratings['rating'].isna()
+    ratings.loc[missing, 'rating'] = [
+        random.Random(provider_id).randint(4, 9) for provider_id in ratings.loc[missing, 'provider_id']
+    ]
+    ratings['rating'] = ratings['rating'].astype(int)
+    return with_row_hash(ratings), int(missing.sum())
+
+def with_row_hash(df: pd.DataFrame) -> pd.DataFrame:
+    """Add a row_hash column fingerprinting every other column"""
+    df = df.reset_index(drop=True)
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    df['row_hash'] = [format(h, '016x') for h in hashes]
+    return df
+
+def copy_rows(engine, table, df: pd.DataFrame) -> float:
+    """Bulk load a DataFrame into a table, returning the seconds taken
+
+    Uses COPY FROM STDIN on PostgreSQL and batched executemany INSERTs elsewhere.
+    """
+    start = time.perf_counter()
+    columns = list(df.columns)
+
+    if engine.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)  # NaN -> empty field -> NULL
+        buffer.seek(0)
+
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            connection.commit()
+        finally:
+            connection.close()
+    else:
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        with engine.begin() as conn:
+            for i in range(0, len(records), BATCH_SIZE):
+                conn.execute(insert(table), records[i:i + BATCH_SIZE])
+
+    return time.perf_counter() - start
+
+def report_load(label: str, rows: int, seconds: float):
+    rate = rows / seconds if seconds else float('inf')
+    print(f"✅ {label} loaded! {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/sec)")
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB on Linux
+
+_DONE = object()
+STAGES = ('parse', 'transform', 'load')
+
+def _put(q: queue.Queue, item, stop: threading.Event):
+    """Blocking put that gives up once the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+def _get(q: queue.Queue, stop: threading.Event):
+    """Blocking get that returns _DONE once the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+def stream_procedures(engine, procedures_csv: str = PROCEDURES_CSV, chunk_size: int = CHUNK_SIZE):
+    """Parse, transform and load the procedures CSV chunk by chunk
+
+    Parsing and transforming run in their own threads, connected to the
+    loader (this thread) by bounded queues, so memory stays at a few chunks
+    however large the file is. Providers are deduplicated across chunks and
+    each chunk's new providers are loaded before its procedures. A failure in
+    any stage stops the other two and is raised here.
+    Returns (provider_ids, procedure_count, stage_stats); stage_stats also
+    holds each table's load rows and seconds under 'tables'.
+    """
+    parsed = queue.Queue(maxsize=QUEUE_DEPTH)
+    transformed = queue.Queue(maxsize=QUEUE_DEPTH)
+    stop = threading.Event()
+    errors = []
+    stats = {stage: {'rows': 0, 'seconds': 0.0} for stage in STAGES}
+    stats['tables'] = {table: {'rows': 0, 'seconds': 0.0} for table in ('providers', 'procedures')}
+    seen_providers = set()
+
+    def parse():
+        try:
+            reader = pd.read_csv(procedures_csv, encoding='latin-1', chunksize=chunk_size,
+                                 float_precision='round_trip')
+            while not stop.is_set():
+                start = time.perf_counter()
+                chunk = next(reader, None)
+                if chunk is None:
+                    break
+                stats['parse']['seconds'] += time.perf_counter() - start
+                stats['parse']['rows'] += len(chunk)
+                _put(parsed, chunk, stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(parsed, _DONE, stop)
+
+    def transform():
+        try:
+            while (chunk := _get(parsed, stop)) is not _DONE:
+                start = time.perf_counter()
+                providers = transform_providers(chunk)
+                providers = providers[~providers['provider_id'].isin(seen_providers)]
+                seen_providers.update(providers['provider_id'])
+                procedures = transform_procedures(chunk)
+                stats['transform']['seconds'] += time.perf_counter() - start
+                stats['transform']['rows'] += len(chunk)
+                _put(transformed, (providers, procedures), stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(transformed, _DONE, stop)
+
+    workers = [threading.Thread(target=parse, daemon=True), threading.Thread(target=transform, daemon=True)]
+    for worker in workers:
+        worker.start()
+
+    procedure_count = 0
+    try:
+        while (item := _get(transformed, stop)) is not _DONE:
+            providers, procedures = item
+            for table, frame in ((Provider.__table__, providers), (Procedure.__table__, procedures)):
+                seconds = copy_rows(engine, table, frame)
+                stats['tables'][table.name]['seconds'] += seconds
+                stats['tables'][table.name]['rows'] += len(frame)
+                stats['load']['seconds'] += seconds
+                stats['load']['rows'] += len(frame)
+            procedure_count += len(procedures)
+            print(f"  ...{procedure_count:,} procedures loaded (peak RSS {peak_rss_mb():.0f} MB)")
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+    return seen_providers, procedure_count, stats
+
+def report_stages(stats: dict):
+    """Print per-stage throughput for the streaming pipeline"""
+    for stage in STAGES:
+        stage_stats = stats[stage]
+        seconds = stage_stats['seconds']
+        rate = stage_stats['rows'] / seconds if seconds else float('inf')
+        print(f"  {stage:<10} {stage_stats['rows']:>10,} rows  {seconds:7.2f}s  {rate:>12,.0f} rows/sec")
+
+def create_tables(engine, tables):
+    """Create tables without their indexes, so bulk loads don't maintain them row by row"""
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(CreateTable(table))
+
+def create_indexes(engine, tables):
+    """Build the indexes skipped by create_tables once the data is in"""
+    start = time.perf_counter()
+    for table in tables:
+        for index in table.indexes:
+            index.create(bind=engine)
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            for table in tables:
+                conn.execute(text(f"ANALYZE {table.name}"))
+    print(f"✅ Indexes built in {time.perf_counter() - start:.2f}s")
+
+def rollup_sql() -> str:
+    """INSERT ... SELECT filling drg_price_rollups with one GROUPING SETS pass (PostgreSQL)"""
+    zip3 = "substr(lpad(providers.zip_code, 5, '0'), 1, 3)"
+    keys = {'drg_code': "procedures.drg_code", 'state': "providers.state", 'zip3': zip3}
+    columns = ['drg_code', 'drg_description', 'state', 'zip3', 'provider_count', 'total_discharges']
+    aggregates = [
+        "procedures.drg_code", "MAX(procedures.drg_description)", "providers.state", zip3,
+        "COUNT(*)", "SUM(procedures.total_discharges)",
+    ]
+    for column, prefix in ROLLUP_PRICES.items():
+        columns += [f"{prefix}_mean", f"{prefix}_min", f"{prefix}_max"]
+        aggregates += [
+            f"SUM(procedures.{column} * procedures.total_discharges) "
+            f"/ NULLIF(SUM(procedures.total_discharges), 0)",
+            f"MIN(procedures.{column})",
+            f"MAX(procedures.{column})",
+        ]
+        for p in ROLLUP_PERCENTILES:
+            columns.append(f"{prefix}_p{p}")
+            aggregates.append(f"percentile_cont({p / 100}) WITHIN GROUP (ORDER BY procedures.{column})")
+    grouping_sets = ", ".join("(" + ", ".join(keys[k] for k in level) + ")" for level in ROLLUP_LEVELS)
+    return (
+        f"INSERT INTO {DrgPriceRollup.__tablename__} ({', '.join(columns)}) "
+        f"SELECT {', '.join(aggregates)} "
+        f"FROM procedures JOIN providers ON providers.provider_id = procedures.provider_id "
+        f"GROUP BY GROUPING SETS ({grouping_sets})"
+    )
+
+def rollup_frame(conn) -> pd.DataFrame:
+    """The same rollup computed with pandas, for databases without percentile_cont"""
+    df = pd.read_sql(
+        select(Procedure.drg_code, Procedure.drg_description, Procedure.total_discharges,
+               *[Procedure.__table__.c[column] for column in ROLLUP_PRICES],
+               Provider.state, Provider.zip_code)
+        .join(Provider, Provider.provider_id == Procedure.provider_id),
+        conn
+    )
+    df['zip3'] = df['zip_code'].astype(str).str.zfill(5).str[:3]
+    quantiles = [p / 100 for p in ROLLUP_PERCENTILES]
+
+    levels = []
+    for keys in ROLLUP_LEVELS:
+        groups = df.groupby(keys, sort=False)
+        rollup = groups.agg(
+            drg_description=('drg_description', 'max'),
+            provider_count=('drg_code', 'size'),
+            total_discharges=('total_discharges', 'sum'),
+        )
+        discharges = rollup['total_discharges'].where(rollup['total_discharges'] != 0)
+        for column, prefix in ROLLUP_PRICES.items():
+            weighted = (df[column] * df['total_discharges']).groupby([df[k] for k in keys], sort=False).sum()
+            rollup[f'{prefix}_mean'] = weighted / discharges
+            rollup[f'{prefix}_min'] = groups[column].min()
+            rollup[f'{prefix}_max'] = groups[column].max()
+            percentiles = groups[column].quantile(quantiles).unstack()  # Linear, like percentile_cont
+            for p, q in zip(ROLLUP_PERCENTILES, quantiles):
+                rollup[f'{prefix}_p{p}'] = percentiles[q]
+        levels.append(rollup.reset_index())
+    return pd.concat(levels, ignore_index=True)
+
+def build_price_rollup(conn) -> int:
+    """Rebuild drg_price_rollups from procedures and providers, returning its row count
+
+    Runs inside the caller's transaction, so readers see either the old or the
+    new rollup. PostgreSQL aggregates in SQL; other databases go through pandas.
+    """
+    start = time.perf_counter()
+    table = DrgPriceRollup.__table__
+    conn.execute(delete(table))
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text(rollup_sql()))
+    else:
+        records = rollup_frame(conn).astype(object)
+        records = records.where(records.notna(), None).to_dict('records')
+        for i in range(0, len(records), BATCH_SIZE):
+            conn.execute(insert(table), records[i:i + BATCH_SIZE])
+    rows = conn.execute(select(func.count()).select_from(table)).scalar()
+    print(f"✅ DRG price rollup built! {rows:,} rows in {time.perf_counter() - start:.2f}s")
+    return rows
+
+def bump_generation(conn):
+    """Advance the dataset generation so API workers drop their cached results"""
+    generation = conn.execute(select(DatasetMeta.generation).where(DatasetMeta.id == 1)).scalar()
+    if generation is None:
+        conn.execute(insert(DatasetMeta).values(id=1, generation=1))
+        return 1
+    conn.execute(update(DatasetMeta).where(DatasetMeta.id == 1).values(generation=generation + 1))
+    return generation + 1
+
+def diff_rows(conn, table, new_df: pd.DataFrame):
+    """Compare new rows against the table by natural key and row_hash
+
+    Returns (upserts, deletes): DataFrames of rows to insert/update and keys to delete.
+    """
+    keys = TABLE_KEYS[table.name]
+    existing = pd.read_sql(select(*[table.c[k] for k in keys], table.c.row_hash), conn)
+    merged = new_df.merge(existing, on=keys, how='outer', suffixes=('', '_old'), indicator=True)
+
+    inserts = merged['_merge'] == 'left_only'
+    updates = (merged['_merge'] == 'both') & (merged['row_hash'] != merged['row_hash_old'])
+    deletes = merged['_merge'] == 'right_only'
+
+    print(f"  {table.name}: {inserts.sum():,} new, {updates.sum():,} changed, "
+          f"{deletes.sum():,} removed, {len(merged) - inserts.sum() - updates.sum() - deletes.sum():,} unchanged")
+    upserts = merged.loc[inserts | updates, new_df.columns].astype(new_df.dtypes.to_dict())
+    return upserts, merged.loc[deletes, keys]
+
+def upsert_rows(conn, table, df: pd.DataFrame):
+    """INSERT ... ON CONFLICT (natural key) DO UPDATE in batches"""
+    if df.empty:
+        return
+    dialect = postgresql if conn.dialect.name == 'postgresql' else sqlite
+    keys = TABLE_KEYS[table.name]
+    statement = dialect.insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={column: statement.excluded[column] for column in df.columns if column not in keys}
+    )
+    records = df.astype(object).where(df.notna(), None).to_dict('records')
+    for i in range(0, len(records), BATCH_SIZE):
+        conn.execute(statement, records[i:i + BATCH_SIZE])
+
+def delete_rows(conn, table, keys_df: pd.DataFrame):
+    """Delete rows by natural key in batches"""
+    keys = TABLE_KEYS[table.name]
+    key_columns = tuple_(*[table.c[k] for k in keys])
+    values = list(keys_df.itertuples(index=False, name=None))
+    for i in range(0, len(values), BATCH_SIZE):
+        conn.execute(delete(table).where(key_columns.in_(values[i:i + BATCH_SIZE])))
+
+def run_incremental_etl(dry_run: bool = False):
+    """Upsert only changed rows and delete vanished ones, in one transaction
+
+    The serving tables stay readable throughout; with dry_run the diff is
+    printed and the transaction rolled back.
+    """
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(engine)  # No-op for tables that already exist
+
+    print("Reading CSV file...")
+    df = pd.read_csv(PROCEDURES_CSV, encoding='latin-1', float_precision='round_trip')
+    print(f"Found {len(df)} rows")
+
+    providers_df = transform_providers(df)
+    procedures_df = transform_procedures(df)
+    ratings_df, _ = transform_ratings(providers_df['provider_id'])
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            print("Diff against database:")
+            changes = {
+                table: diff_rows(conn, table, new_df)
+                for table, new_df in [
+                    (Provider.__table__, providers_df),
+                    (Procedure.__table__, procedures_df),
+                    (Rating.__table__, ratings_df),
+                ]
+            }
+            changed = sum(len(upserts) + len(deletes) for upserts, deletes in changes.values())
+            rollup_missing = conn.execute(select(DrgPriceRollup.id).limit(1)).first() is None
+
+            if dry_run or not (changed or rollup_missing):
+                transaction.rollback()
+                print("\n🔍 Dry run, nothing written." if dry_run else "\n✅ Already up to date.")
+                return
+
+            # Parents before children for upserts, children before parents for deletes
+            for table in [Provider.__table__, Procedure.__table__, Rating.__table__]:
+                upsert_rows(conn, table, changes[table][0])
+            for table in [Rating.__table__, Procedure.__table__, Provider.__table__]:
+                delete_rows(conn, table, changes[table][1])
+            build_price_rollup(conn)
+
+            generation = bump_generation(conn)
+            transaction.commit()
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            transaction.rollback()
+            return
+
+    print(f"\n🎉 Incremental ETL complete! {changed:,} rows changed in "
+          f"{time.perf_counter() - start:.2f}s (dataset generation {generation})")
+
 def run_etl():
     # Create engine (synchronous for ETL)
     engine = create_engine(DATABASE_URL)
-    
+
     # Create all tables
     print("Creating tables...")
-    Base.metadata.drop_all(engine)  # Drop existing tables
-    Base.metadata.create_all(engine)  # Create new tables
-    
-    # Create session
-    Session = sessionmaker(bind=engine)
-    session = Session()
-    
+    data_tables = [Provider.__table__, Procedure.__table__, Rating.__table__]
+    Base.metadata.drop_all(engine, tables=data_tables)  # Drop existing data (dataset_meta is kept)
+    Base.metadata.create_all(engine, tables=[DatasetMeta.__table__, DrgPriceRollup.__table__])
+    create_tables(engine, data_tables)
+
     try:
-        # Read CSV
-        print("Reading CSV file...")
-        df = pd.read_csv('dataset/MUP_INP_RY24_P03_V10_DY22_PrvSvc.csv', encoding='latin-1')
-        print(f"Found {len(df)} rows")
-        
-        # Get unique providers
-        providers_df = df[['Rndrng_Prvdr_CCN', 'Rndrng_Prvdr_Org_Name', 
-                          'Rndrng_Prvdr_City', 'Rndrng_Prvdr_State_Abrvtn', 
-                          'Rndrng_Prvdr_Zip5']].drop_duplicates()
-        
-        print(f"Loading {len(providers_df)} providers...")
-        
-        # Load providers
-        for _, row in providers_df.iterrows():
-            provider = Provider(
-                provider_id=str(row['Rndrng_Prvdr_CCN']),
-                name=row['Rndrng_Prvdr_Org_Name'],
-                city=row['Rndrng_Prvdr_City'],
-                state=row['Rndrng_Prvdr_State_Abrvtn'],
-                zip_code=str(row['Rndrng_Prvdr_Zip5'])
-            )
-            session.add(provider)
-        
-        # Commit providers first
-        session.commit()
-        print("✅ Providers loaded!")
-        
-        # Load procedures
-        print(f"Loading {len(df)} procedures...")
-        for _, row in df.iterrows():
-            procedure = Procedure(
-                provider_id=str(row['Rndrng_Prvdr_CCN']),
-                drg_code=str(row['DRG_Cd']),
-                drg_description=row['DRG_Desc'],
-                total_discharges=int(row['Tot_Dschrgs']),
-                avg_covered_charges=float(row['Avg_Submtd_Cvrd_Chrg']),
-                avg_total_payments=float(row['Avg_Tot_Pymt_Amt']),
-                avg_medicare_payments=float(row['Avg_Mdcr_Pymt_Amt'])
-            )
-            session.add(procedure)
-        
-        # Commit procedures
-        session.commit()
-        print("✅ Procedures loaded!")
-        
-        # Load CMS ratings
+        # Stream providers + procedures in chunks
+        print(f"Streaming {PROCEDURES_CSV} in chunks of {CHUNK_SIZE:,} rows...")
+        provider_ids, procedure_count, stage_stats = stream_procedures(engine)
+        for table, table_stats in stage_stats['tables'].items():
+            report_load(table.capitalize(), table_stats['rows'], table_stats['seconds'])
+        report_stages(stage_stats)
+
+        # Load ratings (real CMS + mock for missing)
         print("Loading CMS hospital ratings...")
-        cms_ratings = pd.read_csv('Hospital_General_Information.csv', encoding='utf-8')
-        cms_ratings['Facility ID'] = cms_ratings['Facility ID'].astype(str)
-        
-        # Create rating mapping
-        rating_map = {}
-        for _, row in cms_ratings.iterrows():
-            facility_id = str(row['Facility ID'])
-            rating = row['Hospital overall rating']
-            
-            # Convert rating to numeric (1-5 scale to 2-10 scale)
-            if rating != 'Not Available':
-                try:
-                    rating_map[facility_id] = int(rating) * 2  # Convert 1-5 to 2-10 scale
-                except:
-                    pass
-        
-        print(f"Loaded {len(rating_map)} real ratings from CMS data")
-        
-        # Generate and load ratings (real + mock for missing)
-        print("Loading ratings (real + mock for missing)...")
-        ratings_added = 0
-        mock_count = 0
-        
-        for provider_id in providers_df['Rndrng_Prvdr_CCN'].unique():
-            provider_id_str = str(provider_id)
-            
-            # Use real rating if available
-            if provider_id_str in rating_map:
-                rating_value = rating_map[provider_id_str]
-            else:
-                # Generate mock rating for missing (4-9 range)
-                rating_value = random.randint(4, 9)
-                mock_count += 1
-            
-            rating = Rating(
-                provider_id=provider_id_str,
-                rating=rating_value
-            )
-            session.add(rating)
-            ratings_added += 1
-        
-        # Commit ratings
-        session.commit()
-        print(f"✅ Ratings loaded! Total: {ratings_added} (Real: {ratings_added - mock_count}, Mock: {mock_count})")
-        
-        print("\n🎉 ETL complete!")
-        print(f"Loaded: {len(providers_df)} providers, {len(df)} procedures, {ratings_added} ratings")
+        ratings_df, mock_count = transform_ratings(provider_ids)
+        ratings_added = len(ratings_df)
+        report_load("Ratings", ratings_added, copy_rows(engine, Rating.__table__, ratings_df))
+
+        create_indexes(engine, data_tables)
+        with engine.begin() as conn:
+            build_price_rollup(conn)
+            generation = bump_generation(conn)
+
+        print(f"\n🎉 ETL complete! (dataset generation {generation})")
+        print(f"Loaded: {len(provider_ids)} providers, {procedure_count} procedures, {ratings_added} ratings")
         print(f"Rating breakdown: {ratings_added - mock_count} real CMS ratings, {mock_count} mock ratings")
-        
+        print(f"Peak RSS: {peak_rss_mb():.0f} MB")
+
     except Exception as e:
         print(f"❌ Error: {e}")
-        session.rollback()
-    finally:
-        session.close()
 
 if __name__ == "__main__":
-    run_etl()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load CMS data into the database")
+    parser.add_argument("--incremental", action="store_true",
+                        help="upsert changed rows instead of dropping and reloading")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="with --incremental, print the diff without writing")
+    args = parser.parse_args()
+
+    if args.incremental:
+        run_incremental_etl(dry_run=args.dry_run)
+    else:
+        run_etl()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app and the ETL read DATABASE_URL at import; the unit tests never connect to it
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
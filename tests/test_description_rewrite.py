@@ -0,0 +1,32 @@
+from app.routers.ai_assistant import resolve_drg_descriptions
+from app.utils.drg_index import DrgIndex
+
+INDEX = DrgIndex([
+    ("469", "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITH MCC"),
+    ("470", "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITHOUT MCC"),
+    ("291", "HEART FAILURE AND SHOCK WITH MCC"),
+])
+
+
+def test_qualified_filter_becomes_code_lookup():
+    sql = "SELECT * FROM procedures WHERE procedures.drg_description ILIKE '%knee%'"
+    assert resolve_drg_descriptions(sql, INDEX) == (
+        "SELECT * FROM procedures WHERE procedures.drg_code IN ('469', '470')"
+    )
+
+
+def test_unqualified_filter_stays_unqualified():
+    sql = "SELECT * FROM procedures WHERE drg_description LIKE '%heart failure%'"
+    assert resolve_drg_descriptions(sql, INDEX) == "SELECT * FROM procedures WHERE drg_code IN ('291')"
+
+
+def test_no_match_filters_everything_out():
+    sql = "SELECT * FROM procedures WHERE procedures.drg_description ILIKE '%zzzz%'"
+    assert resolve_drg_descriptions(sql, INDEX) == "SELECT * FROM procedures WHERE 1 = 0"
+
+
+def test_other_tables_and_aliases_are_left_alone():
+    rollup = "SELECT * FROM drg_price_rollups WHERE drg_price_rollups.drg_description ILIKE '%knee%'"
+    aliased = "SELECT * FROM procedures p WHERE p.drg_description ILIKE '%knee%'"
+    assert resolve_drg_descriptions(rollup, INDEX) == rollup
+    assert resolve_drg_descriptions(aliased, INDEX) == aliased
@@ -0,0 +1,64 @@
+import pytest
+
+from app.utils.drg_index import DrgIndex
+
+INDEX = DrgIndex([
+    ("469", "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITH MCC"),
+    ("470", "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITHOUT MCC"),
+    ("291", "HEART FAILURE AND SHOCK WITH MCC"),
+    ("292", "HEART FAILURE AND SHOCK WITH CC"),
+    ("193", "SIMPLE PNEUMONIA AND PLEURISY WITH MCC"),
+    ("193", "SIMPLE PNEUMONIA AND PLEURISY WITH MCC"),  # Duplicates collapse
+])
+
+
+def ilike(term):
+    """Codes a database ILIKE '%term%' would find"""
+    return sorted({code for code, description in zip(INDEX.codes, INDEX.descriptions) if term in description})
+
+
+@pytest.mark.parametrize("term", ["knee", "heart failure", "with mcc", "pleurisy", "cc", "a"])
+def test_substring_tier_matches_ilike(term):
+    assert sorted(INDEX.search(term)) == ilike(term)
+
+
+def test_token_tier_matches_word_prefixes():
+    assert INDEX.search("knee replace") == ["469", "470"]
+    assert INDEX.search("Heart  SHOCK") == ["292", "291"]  # Shorter description first
+
+
+def test_substring_tier_ranks_whole_words_then_prefixes():
+    index = DrgIndex([
+        ("001", "CARDIAC ARRHYTHMIA"),
+        ("002", "ARRHYTHMIA AND CONDUCTION DISORDERS WITH CARDIAC CATH"),
+        ("003", "ELECTROCARDIAC STUDY"),
+        ("004", "CARDIACS"),
+    ])
+    assert index.search("cardiac") == ["001", "002", "004", "003"]
+
+
+def test_token_tier_ranks_whole_words_first():
+    index = DrgIndex([
+        ("010", "KNEE REPLACEMENTS"),
+        ("011", "REVISION OF KNEE REPLACEMENT WITH MCC"),
+    ])
+    assert index.search("replacement knee") == ["011", "010"]
+    assert index.search("replac knee") == ["010", "011"]
+
+
+def test_fuzzy_tier_tolerates_typos():
+    assert set(INDEX.search("pnuemonia")) == {"193"}
+    assert set(INDEX.search("replacment")) == {"469", "470"}
+
+
+def test_no_match_and_blank_terms():
+    assert INDEX.search("xylophone") == []
+    assert INDEX.search("   ") == []
+    assert len(INDEX) == 5
+
+
+def test_covers_requires_every_word():
+    assert INDEX.covers("knee replacement")
+    assert INDEX.covers("heart")
+    assert not INDEX.covers("knee heart")
+    assert not INDEX.covers("")
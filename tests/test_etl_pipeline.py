@@ -0,0 +1,83 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import etl
+
+ROWS = 40
+
+
+def write_procedures_csv(path):
+    pd.DataFrame({
+        'Rndrng_Prvdr_CCN': [f"{10000 + i}" for i in range(ROWS)],
+        'Rndrng_Prvdr_Org_Name': [f"Hospital {i}" for i in range(ROWS)],
+        'Rndrng_Prvdr_City': ['Springfield'] * ROWS,
+        'Rndrng_Prvdr_State_Abrvtn': ['NY'] * ROWS,
+        'Rndrng_Prvdr_Zip5': ['00000'] * ROWS,
+        'DRG_Cd': ['470'] * ROWS,
+        'DRG_Desc': ['MAJOR HIP AND KNEE JOINT REPLACEMENT'] * ROWS,
+        'Tot_Dschrgs': [11] * ROWS,
+        'Avg_Submtd_Cvrd_Chrg': [1000.5] * ROWS,
+        'Avg_Tot_Pymt_Amt': [900.25] * ROWS,
+        'Avg_Mdcr_Pymt_Amt': [800.0] * ROWS,
+    }).to_csv(path, index=False)
+
+
+def run_with_timeout(target, seconds=10):
+    """Run target in a thread; fail instead of hanging if it never returns"""
+    outcome = {}
+
+    def run():
+        try:
+            outcome['result'] = target()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "pipeline did not shut down"
+    return outcome
+
+
+def test_stream_procedures_loads_every_chunk(tmp_path, monkeypatch):
+    csv = tmp_path / 'procedures.csv'
+    write_procedures_csv(csv)
+    loaded = []
+    monkeypatch.setattr(etl, 'get_zip_coordinates', lambda zip_code: None)
+    monkeypatch.setattr(etl, 'copy_rows', lambda engine, table, frame: loaded.append(len(frame)) or 0.0)
+
+    outcome = run_with_timeout(lambda: etl.stream_procedures(None, str(csv), chunk_size=7))
+
+    provider_ids, procedure_count, stats = outcome['result']
+    assert procedure_count == ROWS
+    assert len(provider_ids) == ROWS
+    assert stats['parse']['rows'] == ROWS
+    assert stats['tables']['providers']['rows'] == ROWS
+    assert stats['tables']['procedures']['rows'] == ROWS
+    assert sum(loaded) == 2 * ROWS
+
+
+def test_stream_procedures_load_failure_is_raised(tmp_path, monkeypatch):
+    csv = tmp_path / 'procedures.csv'
+    write_procedures_csv(csv)
+    monkeypatch.setattr(etl, 'get_zip_coordinates', lambda zip_code: None)
+    monkeypatch.setattr(etl, 'QUEUE_DEPTH', 1)
+
+    def failing_copy(engine, table, frame):
+        raise RuntimeError("COPY failed")
+
+    monkeypatch.setattr(etl, 'copy_rows', failing_copy)
+
+    outcome = run_with_timeout(lambda: etl.stream_procedures(None, str(csv), chunk_size=1))
+
+    assert isinstance(outcome.get('error'), RuntimeError)
+
+
+def test_stream_procedures_parse_failure_is_raised(tmp_path, monkeypatch):
+    monkeypatch.setattr(etl, 'copy_rows', lambda engine, table, frame: 0.0)
+
+    outcome = run_with_timeout(lambda: etl.stream_procedures(None, str(tmp_path / 'missing.csv')))
+
+    assert isinstance(outcome.get('error'), FileNotFoundError)
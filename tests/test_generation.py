@@ -0,0 +1,40 @@
+import asyncio
+
+from app.utils import generation
+
+
+class GenerationDb:
+    """Answers the dataset_meta read with a settable generation, counting reads"""
+
+    def __init__(self, value):
+        self.value = value
+        self.reads = 0
+
+    async def execute(self, statement):
+        self.reads += 1
+        value = self.value
+
+        class Result:
+            def scalar(self):
+                return value
+        return Result()
+
+
+def test_generation_is_rechecked_after_the_interval(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(generation.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(generation, "GENERATION_CHECK_INTERVAL", 5.0)
+    monkeypatch.setattr(generation, "_generation", None)
+    changes = []
+    monkeypatch.setattr(generation, "_listeners", [lambda: changes.append(1)])
+    db = GenerationDb(3)
+
+    assert asyncio.run(generation.get_dataset_generation(db)) == 3
+    db.value = 4
+    clock[0] += 4
+    assert asyncio.run(generation.get_dataset_generation(db)) == 3  # Within the interval: no read
+    assert db.reads == 1 and not changes
+
+    clock[0] += 2
+    assert asyncio.run(generation.get_dataset_generation(db)) == 4
+    assert db.reads == 2 and changes == [1]
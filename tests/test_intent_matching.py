@@ -0,0 +1,36 @@
+import pytest
+
+from app.routers.ai_assistant import match_intent
+from app.utils.drg_index import DrgIndex
+
+INDEX = DrgIndex([
+    ("470", "MAJOR HIP AND KNEE JOINT REPLACEMENT OR REATTACHMENT OF LOWER EXTREMITY WITHOUT MCC"),
+    ("291", "HEART FAILURE AND SHOCK WITH MCC"),
+])
+
+
+@pytest.mark.parametrize("question, intent, fragment", [
+    ("Cheapest hospitals for DRG 470", "cheapest", "procedures.drg_code = '470' ORDER BY procedures.avg_covered_charges ASC"),
+    ("Which hospitals have the best ratings for heart failure?", "best_rated",
+     "procedures.drg_description ILIKE '%heart failure%' ORDER BY ratings.rating DESC"),
+    ("Top 3 busiest hospitals for knee replacement near 10001", "most_discharges", "LIMIT 3"),
+    ("Which hospitals have the most discharges for DRG 291?", "most_discharges",
+     "ORDER BY procedures.total_discharges DESC"),
+])
+def test_known_shapes_match(question, intent, fragment):
+    matched, sql = match_intent(question, INDEX)
+    assert matched == intent
+    assert fragment in sql
+
+
+@pytest.mark.parametrize("question", [
+    "Cheapest hospitals for DRG 470 in Texas",           # Extra condition
+    "Cheapest and best rated hospitals for DRG 470",     # Two intents
+    "Cheapest hospitals for dental implants",            # Not a DRG description
+    "What is the weather like today?",
+    "Cheapest hospitals",                                 # No procedure at all
+    "Top 0 cheapest hospitals for DRG 470",               # Nothing to list
+    "Most expensive hospitals for knee replacement",      # "most" alone isn't volume
+])
+def test_other_questions_fall_back_to_the_model(question):
+    assert match_intent(question, INDEX) == (None, None)
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import Base, DrgPriceRollup
+from app.routers import ai_assistant
+from app.utils import location
+
+ROLLUP_SQL = (
+    "SELECT drg_price_rollups.* FROM drg_price_rollups "
+    "WHERE drg_price_rollups.drg_code = '470' AND drg_price_rollups.zip3 = '100'"
+)
+
+
+@pytest.fixture
+def rollup_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(location, "get_zip_coordinates", lambda zip_code: (40.75, -73.99))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rollup.db'}")
+
+    async def load():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as db:
+            db.add(DrgPriceRollup(
+                drg_code="470", drg_description="KNEE REPLACEMENT", state="NY", zip3="100",
+                provider_count=12, total_discharges=340,
+                covered_charges_p10=40000.0, covered_charges_p50=60000.0, covered_charges_p90=90000.0,
+                total_payments_p50=18000.0,
+            ))
+            await db.commit()
+
+    asyncio.run(load())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.mark.parametrize("question", [
+    "What's a typical price for DRG 470 near 10001?",
+    "Typical price for DRG 470 within 20 miles of 10001",
+])
+def test_rollup_question_with_a_location_keeps_its_rows(rollup_db, question):
+    async def run():
+        async with AsyncSession(rollup_db) as db:
+            return await ai_assistant.execute_with_location_filter(db, ROLLUP_SQL, question)
+
+    rows = asyncio.run(run())
+    assert len(rows) == 1
+    answer = ai_assistant.format_answer(question, rows, ROLLUP_SQL)
+    assert "No results" not in answer
+    assert "60,000" in answer
@@ -0,0 +1,69 @@
+import base64
+import json
+
+import pytest
+
+from app.utils.paging import TopK, decode_cursor, encode_cursor
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort, key", [
+    ("price", (1234.5, "330101", "470")),
+    ("distance", (0.0, "330101", "470")),
+    ("rating", (-8, "330101", "470")),
+])
+def test_cursor_round_trip(sort, key):
+    assert decode_cursor(encode_cursor(sort, key), sort) == key
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", raw_cursor({"price": 1}), raw_cursor(["price", 1, "A"])])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, "price")
+
+
+def test_cursor_from_another_sort_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("price", (10.0, "A", "470")), "distance")
+
+
+@pytest.mark.parametrize("sort, payload", [
+    ("price", ["price", "100", "A", "470"]),
+    ("price", ["price", True, "A", "470"]),
+    ("price", ["price", None, "A", "470"]),
+    ("distance", ["distance", float("inf"), "A", "470"]),
+    ("price", ["price", 10 ** 400, "A", "470"]),
+    ("rating", ["rating", -7.5, "A", "470"]),
+    ("price", ["price", 100.0, 42, "470"]),
+    ("price", ["price", 100.0, "A", ["470"]]),
+])
+def test_cursor_with_wrong_field_types_is_rejected(sort, payload):
+    with pytest.raises(ValueError):
+        decode_cursor(raw_cursor(payload), sort)
+
+
+def test_topk_keeps_the_smallest_in_order():
+    top = TopK(3, key=lambda item: item)
+    for value in [9, 1, 8, 2, 7, 3] * 50:
+        top.push(value)
+    assert top.result() == [1, 1, 1]
+
+    everything = TopK(None, key=lambda item: item)
+    for value in [3, 1, 2]:
+        everything.push(value)
+    assert everything.result() == [1, 2, 3]
+
+
+def test_providers_answers_a_crafted_cursor_with_400():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routers import providers
+
+    client = TestClient(FastAPI(routes=providers.router.routes))
+    cursor = raw_cursor(["price", "cheap", "A", "470"])
+    response = client.get("/providers", params={"drg": "470", "zip": "10001", "cursor": cursor})
+    assert response.status_code == 400
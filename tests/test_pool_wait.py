@@ -0,0 +1,43 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import database
+from app.database import TimedQueuePool, get_db
+
+
+def test_checkout_wait_is_recorded_when_the_pool_is_exhausted(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+                                     poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+        before = database.pool_wait_seconds.count, database.pool_wait_seconds.sum
+
+        async def hold():
+            async with AsyncSession(engine) as session:
+                await session.execute(text("SELECT 1"))
+                await asyncio.sleep(0.2)
+
+        async def wait():
+            await asyncio.sleep(0.05)
+            async with AsyncSession(engine) as session:
+                await session.execute(text("SELECT 1"))
+
+        await asyncio.gather(hold(), wait())
+        await engine.dispose()
+        return before
+
+    count, total = asyncio.run(scenario())
+    assert database.pool_wait_seconds.count == count + 2
+    assert database.pool_wait_seconds.sum - total >= 0.1
+
+
+def test_get_db_does_not_check_out_a_connection():
+    async def scenario():
+        sessions = get_db()
+        session = await sessions.__anext__()
+        held = session.in_transaction()
+        await sessions.aclose()
+        return held
+
+    assert asyncio.run(scenario()) is False
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import Base, Procedure, Provider, Rating
+from app.routers import providers
+from app.schemas import ProviderQuery
+from app.utils import columnar, location
+from app.utils.paging import decode_cursor
+
+ORIGIN = (40.75, -73.99)
+# provider_id, km north of the origin (0.009 degrees ~ 1 km), covered charges, rating
+HOSPITALS = [
+    ("A", 1, 300.0, 8), ("B", 2, 100.0, None), ("C", 3, 200.0, 6), ("D", 4, 100.0, 8),
+    ("E", 5, 500.0, 10), ("F", 6, 200.0, 4), ("G", 7, 100.0, 6), ("H", 500, 50.0, 10),
+]
+
+
+@pytest.fixture(params=["sql", "columnar"])
+def search_db(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(location, "get_zip_coordinates", lambda zip_code: ORIGIN if zip_code == "10001" else None)
+    monkeypatch.setattr(providers, "get_zip_coordinates", location.get_zip_coordinates)
+    monkeypatch.setattr(columnar, "COLUMNAR_ENGINE", request.param == "columnar")
+    location.invalidate_provider_cache()
+    columnar.invalidate_columnar_store()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+
+    async def load():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine) as db:
+            for provider_id, km, charges, rating in HOSPITALS:
+                db.add(Provider(provider_id=provider_id, name=f"Hospital {provider_id}", city="New York",
+                                state="NY", zip_code="10001", lat=ORIGIN[0] + km * 0.009, lng=ORIGIN[1]))
+                db.add(Procedure(provider_id=provider_id, drg_code="470", drg_description="KNEE",
+                                 total_discharges=20, avg_covered_charges=charges,
+                                 avg_total_payments=charges / 2, avg_medicare_payments=charges / 4))
+                if rating is not None:
+                    db.add(Rating(provider_id=provider_id, rating=rating))
+            await db.commit()
+
+    asyncio.run(load())
+    yield engine
+    asyncio.run(engine.dispose())
+    location.invalidate_provider_cache()
+    columnar.invalidate_columnar_store()
+
+
+def search(engine, sort, limit=None, cursor=None):
+    async def run():
+        async with AsyncSession(engine) as db:
+            after = decode_cursor(cursor, sort) if cursor else None
+            return await providers.find_providers(db, "470", "10001", 50, sort, limit, after)
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("sort", ["price", "distance", "rating"])
+def test_pages_cover_the_full_result_in_order(search_db, sort):
+    full = search(search_db, sort)
+    assert full["total_found"] == 7  # H is outside the radius
+    assert full["next_cursor"] is None
+
+    paged, cursor = [], None
+    while True:
+        page = search(search_db, sort, limit=3, cursor=cursor)
+        assert page["total_found"] == 7
+        assert len(page["providers"]) <= 3
+        paged.extend(page["providers"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert [p["provider_id"] for p in paged] == [p["provider_id"] for p in full["providers"]]
+
+
+def test_sort_orders_and_tiebreaks(search_db):
+    ids = lambda sort: [p["provider_id"] for p in search(search_db, sort)["providers"]]
+    assert ids("price") == ["B", "D", "G", "C", "F", "A", "E"]
+    assert ids("distance") == ["A", "B", "C", "D", "E", "F", "G"]
+    assert ids("rating") == ["E", "A", "D", "C", "G", "F", "B"]
+
+
+def test_batch_pages_report_the_full_total(search_db):
+    async def run():
+        async with AsyncSession(search_db) as db:
+            return await providers.find_providers_batch(db, [
+                ProviderQuery(drg="470", zip="10001", limit=2),
+                ProviderQuery(drg="470", zip="10001", sort="distance"),
+            ])
+
+    limited, unlimited = asyncio.run(run())
+    assert limited["total_found"] == unlimited["total_found"] == 7
+    assert len(limited["providers"]) == 2
+    assert limited["next_cursor"] is not None
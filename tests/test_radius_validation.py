@@ -0,0 +1,25 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app.routers import providers
+from app.schemas import ProviderQuery
+
+client = TestClient(FastAPI(routes=providers.router.routes))
+
+
+@pytest.mark.parametrize("radius", ["inf", "-inf", "nan", "0", "-5"])
+def test_providers_rejects_non_positive_or_non_finite_radius(radius):
+    response = client.get("/providers", params={"drg": "470", "zip": "10001", "radius_km": radius})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("radius", [float("inf"), float("nan"), 0, -5])
+def test_batch_query_rejects_non_positive_or_non_finite_radius(radius):
+    with pytest.raises(ValidationError):
+        ProviderQuery(drg="470", zip="10001", radius_km=radius)
+
+
+def test_batch_query_accepts_a_finite_radius():
+    assert ProviderQuery(drg="470", zip="10001", radius_km=25.5).radius_km == 25.5
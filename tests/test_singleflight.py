@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.utils import singleflight
+from app.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    flight = SingleFlight("test-share")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == {"answer": 42} for result in results)
+    assert flight.stats()["leaders"] == 1
+    assert flight.stats()["coalesced"] == 19
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight("test-keys")
+
+    async def run():
+        return await asyncio.gather(*(flight.do(k, lambda k=k: asyncio.sleep(0.01, result=k)) for k in "abc"))
+
+    assert asyncio.run(run()) == ["a", "b", "c"]
+    assert flight.leaders == 3
+
+
+def test_exceptions_reach_every_waiter():
+    flight = SingleFlight("test-error")
+
+    async def compute():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("LLM down")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.leaders == 1
+
+
+def test_waiter_takes_over_from_a_cancelled_leader():
+    flight = SingleFlight("test-cancel")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.create_task(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == 2
+    assert flight.leaders == 2
+
+
+def test_disabled_flight_runs_every_call(monkeypatch):
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_ENABLED", False)
+    flight = SingleFlight("test-disabled")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*(flight.do("key", compute) for _ in range(3)))
+
+    asyncio.run(run())
+    assert len(calls) == 3
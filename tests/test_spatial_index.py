@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.utils.location import (
+    EARTH_RADIUS_KM, RADIUS_BUCKETS_KM, SpatialIndex, bounding_box, haversine_km, radius_bucket,
+)
+
+rng = np.random.default_rng(7)
+LATS = rng.uniform(25, 49, 2000)
+LNGS = rng.uniform(-124, -67, 2000)
+IDS = [f"P{i:04d}" for i in range(len(LATS))]
+INDEX = SpatialIndex(IDS, [f"{i:05d}" for i in range(len(LATS))], LATS, LNGS)
+
+
+def brute_force(lat, lng, radius_km):
+    distances = haversine_km(lat, lng, LATS, LNGS)
+    inside = np.flatnonzero(distances <= radius_km)
+    return {IDS[i] for i in inside}
+
+
+def test_haversine_known_distance():
+    # New York to Los Angeles is about 3,936 km
+    distance = haversine_km(40.7128, -74.0060, np.array([34.0522]), np.array([-118.2437]))[0]
+    assert distance == pytest.approx(3936, rel=0.01)
+    assert haversine_km(10.0, 20.0, np.array([10.0]), np.array([20.0]))[0] == 0
+
+
+@pytest.mark.parametrize("lat, lng", [(40.75, -73.99), (47.6, -122.3), (25.1, -80.2)])
+def test_bounding_box_contains_the_radius(lat, lng):
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, 300)
+    bearings = np.radians(np.arange(0, 360, 5))
+    # Points 300 km away in every direction, by the spherical destination formula
+    d = 300 / EARTH_RADIUS_KM
+    lat1, lng1 = np.radians(lat), np.radians(lng)
+    lats = np.degrees(np.arcsin(np.sin(lat1) * np.cos(d) + np.cos(lat1) * np.sin(d) * np.cos(bearings)))
+    lngs = lng + np.degrees(np.arctan2(np.sin(bearings) * np.sin(d) * np.cos(lat1),
+                                       np.cos(d) - np.sin(lat1) * np.sin(np.radians(lats))))
+    eps = 1e-9  # Due north and south the box edge is exact
+    assert (lats >= min_lat - eps).all() and (lats <= max_lat + eps).all()
+    assert (lngs >= min_lng).all() and (lngs <= max_lng).all()
+
+
+@pytest.mark.parametrize("radius_km", [5, 50, 250, 1000, 6000])
+@pytest.mark.parametrize("lat, lng", [(40.75, -73.99), (37.77, -122.42), (30.0, -95.0)])
+def test_within_radius_matches_brute_force(lat, lng, radius_km):
+    ids, distances = INDEX.within_radius(lat, lng, radius_km)
+    assert set(ids) == brute_force(lat, lng, radius_km)
+    assert (np.diff(distances) >= 0).all()
+    assert (distances <= radius_km).all()
+
+
+def test_nearest_returns_the_k_closest():
+    ids, distances = INDEX.nearest(40.75, -73.99, 15)
+    all_distances = haversine_km(40.75, -73.99, LATS, LNGS)
+    expected = [IDS[i] for i in np.argsort(all_distances, kind="stable")[:15]]
+    assert list(ids) == expected
+    assert distances == pytest.approx(np.sort(all_distances)[:15])
+
+
+def test_nearest_with_k_larger_than_the_index():
+    ids, _ = INDEX.nearest(40.75, -73.99, len(IDS) + 10)
+    assert len(ids) == len(IDS)
+
+
+def test_neighbors_slice_to_a_smaller_radius():
+    neighbors = INDEX.neighbors(40.75, -73.99, 500)
+    smaller = neighbors.within(120)
+    assert set(smaller.provider_ids) == brute_force(40.75, -73.99, 120)
+    assert len(neighbors.within(0)) == 0
+    assert smaller.distance_map() == dict(zip(smaller.provider_ids.tolist(), smaller.distances_km.tolist()))
+    assert set(smaller.zip_distance_map()) == set(smaller.zip_codes.tolist())
+
+
+def test_empty_index():
+    empty = SpatialIndex([], [], [], [])
+    ids, distances = empty.within_radius(40.75, -73.99, 100)
+    assert len(ids) == len(distances) == 0
+    assert len(empty.neighbors(40.75, -73.99, 100)) == 0
+
+
+@pytest.mark.parametrize("radius_km, bucket", [(0.5, 10), (10, 10), (10.01, 25), (2500, 2500), (2501, 3000)])
+def test_radius_bucket_covers_the_radius(radius_km, bucket):
+    assert radius_bucket(radius_km) == bucket
+    assert radius_bucket(radius_km) >= radius_km
+
+
+def test_radius_buckets_are_sorted():
+    assert list(RADIUS_BUCKETS_KM) == sorted(RADIUS_BUCKETS_KM)
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.utils import sql_guard
+from app.utils.sql_guard import RejectedQuery, check_plan, check_read_only, guarded_fetch
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT name FROM providers",
+    "select name from providers;",
+    "WITH cheap AS (SELECT * FROM procedures) SELECT * FROM cheap",
+    "SELECT replace(name, 'a', 'b') FROM providers",
+    "SELECT name FROM providers WHERE name = 'DROP TABLE; DELETE'",
+    "SELECT name -- delete everything\nFROM providers",
+    'SELECT "update" FROM providers',
+])
+def test_read_only_statements_pass(sql):
+    check_read_only(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM providers",
+    "SELECT 1; DROP TABLE providers",
+    "SELECT * FROM providers FOR UPDATE",
+    "SELECT * INTO backup FROM providers",
+    "SELECT pg_sleep(10)",
+    "SELECT set_config('statement_timeout', '0', false)",
+    "WITH gone AS (DELETE FROM providers RETURNING *) SELECT * FROM gone",
+    "EXPLAIN ANALYZE SELECT 1",
+    "PRAGMA table_info(providers)",
+])
+def test_writes_and_unsafe_statements_are_rejected(sql):
+    before = sql_guard.rejections["read_only"]
+    with pytest.raises(RejectedQuery) as rejected:
+        check_read_only(sql)
+    assert rejected.value.reason == "read_only"
+    assert sql_guard.rejections["read_only"] == before + 1
+
+
+class FakePlanDb:
+    """Answers EXPLAIN with a fixed plan and counts how often it was asked"""
+
+    def __init__(self, cost, rows):
+        self.plan = [{"Plan": {"Total Cost": cost, "Plan Rows": rows}}]
+        self.explains = 0
+
+    async def execute(self, statement):
+        self.explains += 1
+        plan = self.plan
+
+        class Result:
+            def scalar(self):
+                return plan
+        return Result()
+
+
+def test_check_plan_limits_and_cache():
+    sql_guard.plan_cache.clear()
+    cheap = FakePlanDb(cost=10, rows=5)
+    asyncio.run(check_plan(cheap, "SELECT 1 AS cheap"))
+    asyncio.run(check_plan(cheap, "SELECT 1 AS cheap"))
+    assert cheap.explains == 1
+
+    with pytest.raises(RejectedQuery) as costly:
+        asyncio.run(check_plan(FakePlanDb(cost=sql_guard.SQL_GUARD_MAX_COST + 1, rows=5), "SELECT 2"))
+    assert costly.value.reason == "cost"
+
+    with pytest.raises(RejectedQuery) as wide:
+        asyncio.run(check_plan(FakePlanDb(cost=10, rows=sql_guard.SQL_GUARD_MAX_PLAN_ROWS + 1), "SELECT 3"))
+    assert wide.value.reason == "plan_rows"
+
+
+def test_guarded_fetch_caps_rows(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'guard.db'}")
+        async with AsyncSession(engine) as db:
+            await db.execute(text("CREATE TABLE numbers (n INTEGER)"))
+            await db.execute(text("INSERT INTO numbers VALUES " + ", ".join(f"({i})" for i in range(50))))
+            capped = await guarded_fetch(db, "SELECT n FROM numbers ORDER BY n", max_rows=10)
+            exact = await guarded_fetch(db, "SELECT n FROM numbers ORDER BY n", max_rows=50)
+        await engine.dispose()
+        return capped, exact
+
+    truncated = sql_guard.guard_counters["truncated"]
+    capped, exact = asyncio.run(run())
+    assert [row.n for row in capped] == list(range(10))
+    assert len(exact) == 50
+    assert sql_guard.guard_counters["truncated"] == truncated + 1
+
+
+def test_guarded_fetch_rejects_before_running():
+    class NeverRun:
+        async def execute(self, statement):
+            raise AssertionError("a rejected statement reached the database")
+
+    with pytest.raises(RejectedQuery):
+        asyncio.run(guarded_fetch(NeverRun(), "DELETE FROM providers"))
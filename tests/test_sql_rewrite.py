@@ -0,0 +1,96 @@
+import pytest
+
+from app.utils.sql_rewrite import (
+    UnsupportedQuery, cap_limit, parse_select, prune_columns, reads_table, restrict_providers, rewrite_select,
+    table_alias,
+)
+
+SQL = ("SELECT providers.name, procedures.avg_covered_charges FROM providers "
+       "JOIN procedures ON providers.provider_id = procedures.provider_id "
+       "WHERE procedures.drg_code = '470' ORDER BY procedures.avg_covered_charges ASC LIMIT 5")
+
+
+def test_parse_select_splits_top_level_clauses():
+    clauses = parse_select(SQL + ";")
+    assert list(clauses) == ["SELECT", "FROM", "WHERE", "ORDER BY", "LIMIT"]
+    assert clauses["WHERE"] == "procedures.drg_code = '470'"
+    assert clauses["LIMIT"] == "5"
+
+
+def test_keywords_in_literals_and_subqueries_are_ignored():
+    sql = ("SELECT name FROM providers WHERE name = 'ORDER BY LIMIT' AND provider_id IN "
+           "(SELECT provider_id FROM ratings WHERE rating > 8 ORDER BY rating LIMIT 3)")
+    clauses = parse_select(sql)
+    assert list(clauses) == ["SELECT", "FROM", "WHERE"]
+    assert clauses["WHERE"].endswith("ORDER BY rating LIMIT 3)")
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH x AS (SELECT 1) SELECT * FROM x",
+    "SELECT name FROM providers UNION SELECT name FROM providers",
+    "SELECT name FROM providers; SELECT 1",
+    "SELECT name FROM providers WHERE name = 'unterminated",
+    "SELECT name FROM providers WHERE (rating > 1",
+    "SELECT name FROM providers LIMIT 1 WHERE rating > 1",
+    "SELECT 1",
+    "UPDATE providers SET name = 'x'",
+])
+def test_unsupported_shapes_raise(sql):
+    with pytest.raises(UnsupportedQuery):
+        parse_select(sql)
+
+
+@pytest.mark.parametrize("from_clause, alias", [
+    ("providers", "providers"),
+    ("providers p JOIN procedures ON p.provider_id = procedures.provider_id", "p"),
+    ("providers AS p", "p"),
+    ("providers JOIN ratings ON providers.provider_id = ratings.provider_id", "providers"),
+    ("procedures", None),
+    ("drg_providers_view", None),
+])
+def test_table_alias(from_clause, alias):
+    assert table_alias(from_clause, "providers") == alias
+
+
+def test_restrict_providers_ands_into_where():
+    clauses = restrict_providers(parse_select(SQL), ["A", "O'B"])
+    assert clauses["WHERE"] == "(procedures.drg_code = '470') AND providers.provider_id IN ('A', 'O''B')"
+
+    no_where = restrict_providers(parse_select("SELECT * FROM providers p"), [])
+    assert no_where["WHERE"] == "1 = 0"
+
+    with pytest.raises(UnsupportedQuery):
+        restrict_providers(parse_select("SELECT * FROM procedures"), ["A"])
+
+
+@pytest.mark.parametrize("limit, capped", [(None, "100"), ("5", "5"), ("500", "100"), ("ALL", "100")])
+def test_cap_limit(limit, capped):
+    clauses = {"SELECT": "*", "FROM": "providers"}
+    if limit is not None:
+        clauses["LIMIT"] = limit
+    assert cap_limit(clauses, 100)["LIMIT"] == capped
+
+
+def test_prune_columns_keeps_the_ranking_column():
+    clauses = prune_columns(parse_select(
+        "SELECT DISTINCT * FROM providers p JOIN ratings r ON p.provider_id = r.provider_id ORDER BY r.rating DESC"
+    ))
+    assert clauses["SELECT"] == "DISTINCT p.name, p.city, p.state, p.zip_code, r.rating"
+
+    explicit = parse_select(SQL)
+    assert prune_columns(explicit) == explicit
+
+
+def test_rewrite_select_end_to_end():
+    assert rewrite_select(SQL, 3, provider_ids=["A"]) == (
+        "SELECT providers.name, procedures.avg_covered_charges FROM providers "
+        "JOIN procedures ON providers.provider_id = procedures.provider_id "
+        "WHERE (procedures.drg_code = '470') AND providers.provider_id IN ('A') "
+        "ORDER BY procedures.avg_covered_charges ASC LIMIT 3"
+    )
+
+
+def test_reads_table():
+    assert reads_table(SQL, "providers")
+    assert not reads_table("SELECT drg_price_rollups.* FROM drg_price_rollups WHERE zip3 = '100'", "providers")
+    assert reads_table("WITH x AS (SELECT * FROM providers) SELECT * FROM x", "providers")
@@ -0,0 +1,98 @@
+import asyncio
+import sqlite3
+
+from app.utils.translation_cache import TranslationCache, _to_sql_template, normalize_question
+
+
+def make_cache(tmp_path):
+    return TranslationCache("prompt", path=str(tmp_path / "translations.sqlite3"))
+
+
+def put(cache, question, sql):
+    asyncio.run(cache.put(question, sql))
+
+
+def get(cache, question):
+    return asyncio.run(cache.get(question))
+
+
+def test_normalize_question_extracts_zips_and_numbers():
+    template, params = normalize_question("Top 3 cheapest hospitals for DRG 470 near 10001?")
+    assert template == "top <num> cheapest hospitals for drg <num> near <zip>"
+    assert params == ["3", "470", "10001"]
+
+
+def test_to_sql_template_requires_one_literal_per_param():
+    sql = "SELECT * FROM procedures WHERE drg_code = '470' LIMIT 3"
+    assert _to_sql_template(sql, ["3", "470"]) == "SELECT * FROM procedures WHERE drg_code = '{p1}' LIMIT {p0}"
+    assert _to_sql_template("SELECT 1 WHERE rating >= 8", ["4"]) is None
+    assert _to_sql_template("SELECT * WHERE drg_code = '1' LIMIT 1", ["1"]) is None
+
+
+def test_template_is_shared_across_values(tmp_path):
+    cache = make_cache(tmp_path)
+    put(cache, "Top 3 cheapest for DRG 470", "SELECT * FROM procedures WHERE drg_code = '470' LIMIT 3")
+
+    assert get(cache, "top 5 cheapest for drg 23") == "SELECT * FROM procedures WHERE drg_code = '23' LIMIT 5"
+
+
+def test_transformed_number_is_not_templatized(tmp_path):
+    cache = make_cache(tmp_path)
+    sql = "SELECT * FROM ratings WHERE rating >= 8 AND drg_code = '470'"
+    put(cache, "rated 4 stars or better for DRG 470", sql)
+
+    assert get(cache, "rated 2 stars or better for DRG 291") is None
+    assert get(cache, "Rated 4 stars or better for DRG 470") == sql
+
+
+def test_number_repeated_in_sql_is_not_templatized(tmp_path):
+    cache = make_cache(tmp_path)
+    sql = "SELECT * FROM procedures WHERE drg_code = '1' ORDER BY avg_total_payments LIMIT 1"
+    put(cache, "cheapest for DRG 1", sql)
+
+    assert get(cache, "cheapest for DRG 470") is None
+    assert get(cache, "cheapest for DRG 1") == sql
+
+
+def test_verbatim_entries_are_not_used_for_similar_questions(tmp_path):
+    cache = make_cache(tmp_path)
+    put(cache, "cheapest hospitals for DRG 1", "SELECT * FROM procedures WHERE drg_code = '1' LIMIT 1")
+
+    assert get(cache, "cheapest hospital for DRG 470") is None
+
+
+def test_entries_survive_a_restart(tmp_path):
+    put(make_cache(tmp_path), "Top 3 cheapest for DRG 470", "SELECT * WHERE drg_code = '470' LIMIT 3")
+
+    cache = make_cache(tmp_path)
+    cache.memory.clear()
+    assert get(cache, "Top 2 cheapest for DRG 23") == "SELECT * WHERE drg_code = '23' LIMIT 2"
+    assert cache.disk_hits == 1
+
+
+def test_failed_disk_write_keeps_the_translation(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(cache, "_write", locked)
+    put(cache, "Top 3 cheapest for DRG 470", "SELECT * WHERE drg_code = '470' LIMIT 3")
+
+    assert cache.write_errors == 1
+    assert get(cache, "Top 3 cheapest for DRG 470") == "SELECT * WHERE drg_code = '470' LIMIT 3"
+
+
+def test_disk_reads_and_writes_share_the_connection_lock(tmp_path):
+    cache = make_cache(tmp_path)
+    put(cache, "Top 3 cheapest for DRG 470", "SELECT * WHERE drg_code = '470' LIMIT 3")
+    cache.memory.clear()
+
+    async def read_while_locked():
+        with cache.lock:
+            pending = asyncio.ensure_future(cache.get("Top 3 cheapest for DRG 470"))
+            await asyncio.sleep(0.05)
+            assert not pending.done()  # The disk read waits for the lock, off the event loop
+        return await pending
+
+    assert asyncio.run(read_while_locked()) == "SELECT * WHERE drg_code = '470' LIMIT 3"
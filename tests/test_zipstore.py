@@ -0,0 +1,52 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from app.utils.zipstore import ZipStore, build_zip_store
+
+ZIPS = [("10001", 40.75, -73.99), ("02134", 42.35, -71.10), ("90210", 34.10, -118.41)]
+
+
+def write_csv(path, rows=ZIPS):
+    with open(path, "w") as f:
+        f.write("zip,lat,lng\n")
+        for zip_code, lat, lng in rows:
+            f.write(f"{zip_code},{lat},{lng}\n")
+        f.write("bad,row,here\n")
+
+
+def test_build_and_lookup(tmp_path):
+    write_csv(tmp_path / "zips.csv")
+    assert build_zip_store(str(tmp_path / "zips.csv"), str(tmp_path / "zips.bin")) == 3
+
+    store = ZipStore(str(tmp_path / "zips.bin"))
+    lat, lng = store.get("02134")
+    assert abs(lat - 42.35) < 1e-4 and abs(lng + 71.10) < 1e-4
+    assert store.get(2134) == store.get("02134")
+    assert store.get("99999") is None
+    assert store.get("not a zip") is None
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_concurrent_builds_publish_a_complete_store(tmp_path):
+    rows = [(f"{i:05d}", 30 + i / 1e4, -90 - i / 1e4) for i in range(1, 20000)]
+    write_csv(tmp_path / "zips.csv", rows)
+    store_path = str(tmp_path / "zips.bin")
+
+    with ProcessPoolExecutor(4) as pool:
+        counts = list(pool.map(build_zip_store, [str(tmp_path / "zips.csv")] * 4, [store_path] * 4))
+
+    assert counts == [len(rows)] * 4
+    store = ZipStore(store_path)
+    assert len(store) == len(rows)
+    assert store.get("12345") is not None
+    assert os.path.getsize(store_path) == 8 + 12 * len(rows)
+
+
+def test_store_file_mode_follows_the_umask(tmp_path):
+    write_csv(tmp_path / "zips.csv")
+    previous = os.umask(0o027)
+    try:
+        build_zip_store(str(tmp_path / "zips.csv"), str(tmp_path / "zips.bin"))
+    finally:
+        os.umask(previous)
+    assert os.stat(tmp_path / "zips.bin").st_mode & 0o777 == 0o640